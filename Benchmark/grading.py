@@ -0,0 +1,65 @@
+"""
+客观题批改基准测试：对比逐份重新计算正确选项与预编译答案表的耗时
+
+用法（在仓库根目录下）：
+    python -m Benchmark.grading
+"""
+import random
+from timeit import timeit
+
+from Core.models import Paper, Question, Option, option_str_
+from Server.core.AnswerKey import AnswerKey
+
+QUESTIONS = 200
+SHEETS = 1000
+
+
+def make_paper(questions: int = QUESTIONS) -> Paper:
+    """
+    生成客观题与主观题混合的试卷，客观题约占四分之三
+    """
+    items = []
+    for index in range(questions):
+        if index % 4 != 3:
+            correct = random.sample(range(4), random.randint(1, 2))
+            items.append(Question(title=f"第{index + 1}题", type="objective", score=2, judgement_reference="",
+                                  options=[Option(correct=i in correct, text=f"{option_str_[i]}. 选项") for i in range(4)]))
+        else:
+            items.append(Question(title=f"第{index + 1}题", type="subjective", score=10, options=[],
+                                  judgement_reference="按点给分"))
+    return Paper(serial_number=1, title="基准测试试卷", questions=items)
+
+
+def make_answers(paper: Paper) -> list[str]:
+    return ["".join(sorted(random.sample("ABCD", random.randint(1, 2)))) if question.type == "objective" else "作答"
+            for question in paper.questions]
+
+
+def legacy_grade(paper: Paper, answers: list[str]) -> int:
+    # 原upload_sheet中的批改逻辑
+    score = 0
+    for index, question in enumerate(paper.questions):
+        if question.type == "objective":
+            if answers[index] == "".join(sorted([option_str_[question.options.index(i)] for i in [i for i in question.options if i.correct]])):
+                score += question.score
+    return score
+
+
+def main() -> None:
+    random.seed(0)
+    paper = make_paper()
+    sheets = [make_answers(paper) for _ in range(SHEETS)]
+    key = AnswerKey.compile(paper)
+    assert all(legacy_grade(paper, answers) == key.grade(answers) for answers in sheets)
+
+    legacy = timeit(lambda: [legacy_grade(paper, answers) for answers in sheets], number=1)
+    compile_time = timeit(lambda: AnswerKey.compile(paper), number=1)
+    compiled = timeit(lambda: [key.grade(answers) for answers in sheets], number=1)
+    print(f"{QUESTIONS} 题试卷，{SHEETS} 份答题卡")
+    print(f"逐份计算：{legacy * 1000:.2f} ms（{legacy / SHEETS * 1e6:.1f} us/份）")
+    print(f"答案表：  {compiled * 1000:.2f} ms（{compiled / SHEETS * 1e6:.1f} us/份），编译一次 {compile_time * 1000:.2f} ms")
+    print(f"加速比：  {legacy / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+端到端压力测试：在本地启动服务器，模拟一整场考试
+
+每个模拟考生按真实协议依次登录、获取考试信息、在考试期间定期轮询考试信息，
+并在结束时间到达时与其他考生同时上传答题卡。结束后按接口统计吞吐量和p50/p95/p99延迟，
+并输出JSON报告以便比较不同版本的结果。
+
+用法（在仓库根目录下）：
+    python -m Benchmark.loadtest --students 2000 --duration 30 --output report.json
+    python -m Benchmark.loadtest --submit-jitter 10  # 模拟考生客户端错开交卷
+    python -m Benchmark.loadtest --address http://127.0.0.1:8080  # 测试已经运行的服务器
+"""
+import asyncio
+import os
+import platform
+import random
+import time
+from argparse import ArgumentParser
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from statistics import mean, quantiles
+
+import httpx
+import ujson as json
+
+from Core.models import AnswerSheet, LoginData, Student
+from Benchmark.grading import make_answers
+from Benchmark.server import start_server, make_exam, set_exam, no_cookies, STUDENT_PASSWORD
+
+
+class Recorder:
+    """
+    按接口记录每个请求的延迟和结果
+    """
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.status: dict[str, dict[int, int]] = {}
+        self.spans: dict[str, list[float]] = {}  # 每个接口第一个请求开始与最后一个请求结束的时间
+        # 状态码0表示连接错误或超时
+
+    async def request(self, route: str, coroutine) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await coroutine
+        except httpx.HTTPError:
+            response = None
+        end = time.perf_counter()
+        self.latencies.setdefault(route, []).append(end - start)
+        span = self.spans.setdefault(route, [start, end])
+        span[0], span[1] = min(span[0], start), max(span[1], end)
+        status = self.status.setdefault(route, {})
+        code = response.status_code if response is not None else 0
+        status[code] = status.get(code, 0) + 1
+        if response is None or response.status_code >= 400 or \
+                (response.status_code == 200 and response.headers.get("content-type") == "application/json"
+                 and response.json().get("recode", 200) != 200):
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+    def report(self) -> dict:
+        routes = {}
+        for route, latencies in self.latencies.items():
+            cuts = quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+            span = self.spans[route][1] - self.spans[route][0]
+            routes[route] = {
+                "count": len(latencies),
+                "errors": self.errors.get(route, 0),
+                "status": {str(code): count for code, count in sorted(self.status[route].items())},
+                "throughput": len(latencies) / span if span else 0.0,
+                "mean": mean(latencies),
+                "p50": cuts[49],
+                "p95": cuts[94],
+                "p99": cuts[98],
+                "max": max(latencies)
+            }
+        return routes
+
+
+async def simulate_student(client: httpx.AsyncClient, recorder: Recorder, exam, uid: str,
+                           poll_interval: float, submit_jitter: float) -> None:
+    login = LoginData(uid=uid, password=STUDENT_PASSWORD)
+    response = await recorder.request("login", client.post("/api/v1/login", json=login.dict()))
+    if response is None or "token" not in response.cookies:
+        return
+    headers = {"Cookie": f"token={response.cookies['token']}"}
+
+    response = await recorder.request("get_exam_info", client.get("/api/v1/get_exam_info", headers=headers))
+    etag = response.headers.get("ETag", "") if response is not None else ""
+    sheet = AnswerSheet(student=Student(uid=uid, nickname="", password=""), exam_id=exam.uuid,
+                        answers=make_answers(exam.paper))
+
+    # 考试期间定期轮询，首次轮询随机错开以免所有考生同时发出
+    end = exam.end_time.timestamp()
+    await asyncio.sleep(random.uniform(0, poll_interval))
+    while end - time.time() > 0:
+        await recorder.request("poll_exam_info", client.get("/api/v1/get_exam_info",
+                                                            headers={**headers, "If-None-Match": etag}))
+        await asyncio.sleep(min(poll_interval, max(end - time.time(), 0)))
+
+    # 与考生客户端一样在结束后随机等待一段时间再交卷，为0时所有考生同时交卷
+    await asyncio.sleep(random.uniform(0, submit_jitter))
+    await recorder.request("upload_sheet", client.post("/api/v1/upload_sheet", content=sheet.json(),
+                                                       headers={**headers, "Idempotency-Key": sheet.digest()}))
+
+
+async def simulate_exam(address: str, exam, concurrency: int, poll_interval: float,
+                        submit_jitter: float) -> Recorder:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=address, cookies=no_cookies(), limits=limits, timeout=300) as client:
+        await asyncio.gather(*[simulate_student(client, recorder, exam, student.uid, poll_interval, submit_jitter)
+                               for student in exam.student_list])
+    return recorder
+
+
+def print_report(routes: dict) -> None:
+    print(f"{'接口':<16}{'请求数':>8}{'错误':>6}{'吞吐量/s':>10}{'p50/ms':>9}{'p95/ms':>9}{'p99/ms':>9}{'max/ms':>9}")
+    for route, stats in routes.items():
+        print(f"{route:<16}{stats['count']:>8}{stats['errors']:>6}{stats['throughput']:>10.1f}"
+              f"{stats['p50'] * 1000:>9.1f}{stats['p95'] * 1000:>9.1f}{stats['p99'] * 1000:>9.1f}"
+              f"{stats['max'] * 1000:>9.1f}")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="模拟一整场考试的端到端压力测试")
+    parser.add_argument("--students", type=int, default=1000, help="模拟考生数")
+    parser.add_argument("--questions", type=int, default=50, help="试卷题目数")
+    parser.add_argument("--duration", type=float, default=30, help="考试时长，单位秒")
+    parser.add_argument("--poll-interval", type=float, default=10, help="考试期间每名考生的轮询间隔，单位秒")
+    parser.add_argument("--submit-jitter", type=float, default=0, help="考试结束后交卷前随机等待的最长时间，单位秒")
+    parser.add_argument("--concurrency", type=int, default=500, help="最大并发连接数")
+    parser.add_argument("--workers", type=int, default=1, help="服务器工作进程数")
+    parser.add_argument("--address", default="", help="已运行的服务器地址，为空时在本地启动服务器")
+    parser.add_argument("--output", default="", help="JSON报告的输出路径")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with (nullcontext(args.address) if args.address else start_server(args.workers)) as address:
+        exam = make_exam(args.students, args.questions, args.duration)
+        set_exam(address, exam)
+        started = time.perf_counter()
+        recorder = asyncio.run(simulate_exam(address, exam, args.concurrency, args.poll_interval,
+                                               args.submit_jitter))
+        elapsed = time.perf_counter() - started
+
+    routes = recorder.report()
+    print_report(routes)
+    report = {
+        "time": datetime.now(tz=timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "elapsed": elapsed,
+        "routes": routes
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
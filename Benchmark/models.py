@@ -0,0 +1,140 @@
+"""
+Core.models基准测试：测量各模型的解析、校验、序列化耗时与单个实例的内存占用
+
+试卷规模为10～1000题，考生名单规模为100～50000人，覆盖Paper、Exam、StudentExam、AnswerSheet以及Results包装。
+每个模型分别测量parse_raw、parse_obj、.json()和.dict()，取多轮中最快的一轮作为结果。
+注意Results.data的类型为Any，包装后的数据不会被校验，因此Results的解析耗时只包含包装本身。
+
+用法（在仓库根目录下）：
+    python -m Benchmark.models
+    python -m Benchmark.models --quick --output models.json
+"""
+import gc
+import random
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from timeit import Timer
+from typing import Any, Callable, Iterator
+
+import ujson as json
+
+from Core.models import AnswerSheet, Exam, Paper, Results, StudentExam, ScoreResult
+from Benchmark.grading import make_paper, make_answers
+from Benchmark.server import make_exam
+
+QUESTIONS = (10, 100, 1000)
+STUDENTS = (100, 1000, 10000, 50000)
+QUICK_QUESTIONS = (10, 100)
+QUICK_STUDENTS = (100, 1000)
+
+
+class Case:
+    """
+    一个待测的模型实例
+
+    参数：
+        name(str): 用例名
+        model(type): 模型类
+        instance(BaseModel): 模型实例
+    """
+    def __init__(self, name: str, model: type, instance):
+        self.name = name
+        self.model = model
+        self.instance = instance
+        self.raw = instance.json()
+        self.obj = json.loads(self.raw)  # 与接口收到的请求体一致，datetime为时间戳
+
+
+def make_cases(questions: tuple[int, ...], students: tuple[int, ...]) -> Iterator[Case]:
+    for count in questions:
+        paper = make_paper(count)
+        yield Case(f"Paper/{count}题", Paper, paper)
+        yield Case(f"AnswerSheet/{count}题", AnswerSheet,
+                   AnswerSheet(student=make_exam(1).student_list[0], exam_id="0", answers=make_answers(paper)))
+        exam = make_exam(students[0], count)
+        exam.paper = paper
+        yield Case(f"StudentExam/{count}题", StudentExam, exam.to_student_exam())
+        yield Case(f"Results[StudentExam]/{count}题", Results, Results(data=exam.to_student_exam()))
+    for count in students:
+        exam = make_exam(count, questions[0])
+        yield Case(f"Exam/{questions[0]}题/{count}人", Exam, exam)
+    exam = make_exam(students[-1], questions[-1])
+    yield Case(f"Exam/{questions[-1]}题/{students[-1]}人", Exam, exam)
+    yield Case("ScoreResult", ScoreResult, ScoreResult(score=100))
+
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    """
+    返回单次调用的耗时（秒），自动确定每轮调用次数，取repeat轮中最快的一轮
+    """
+    timer = Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def measure_memory(function: Callable[[], Any], budget: int = 1 << 26) -> int:
+    """
+    返回function创建的单个实例占用的内存（字节），按估算的总量限制创建的实例数
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        instance = function()
+        size = tracemalloc.get_traced_memory()[0]
+        count = max(1, min(100, budget // max(size, 1)))
+        start = tracemalloc.get_traced_memory()[0]
+        instances = [function() for _ in range(count)]
+        size = (tracemalloc.get_traced_memory()[0] - start) // count
+        del instance, instances
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def bench(case: Case, repeat: int) -> dict:
+    model, instance, raw, obj = case.model, case.instance, case.raw, case.obj
+    return {
+        "model": case.name,
+        "bytes": len(raw.encode("utf-8")),
+        "parse_raw": measure(lambda: model.parse_raw(raw), repeat),
+        "parse_obj": measure(lambda: model.parse_obj(obj), repeat),
+        "json": measure(lambda: instance.json(), repeat),
+        "dict": measure(lambda: instance.dict(), repeat),
+        "memory": measure_memory(lambda: model.parse_raw(raw))  # 从JSON解析，实例不与其他对象共享数据
+    }
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main() -> None:
+    parser = ArgumentParser(description="测量Core.models的解析、校验、序列化耗时与内存占用")
+    parser.add_argument("--quick", action="store_true", help="只测量较小的规模")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的轮数")
+    parser.add_argument("--output", default="", help="JSON报告的输出路径")
+    args = parser.parse_args()
+
+    random.seed(0)
+    questions, students = (QUICK_QUESTIONS, QUICK_STUDENTS) if args.quick else (QUESTIONS, STUDENTS)
+    results = []
+    print(f"{'模型':<32}{'大小/KB':>10}{'parse_raw':>12}{'parse_obj':>12}{'.json()':>12}{'.dict()':>12}{'内存/KB':>10}")
+    for case in make_cases(questions, students):
+        result = bench(case, args.repeat)
+        results.append(result)
+        print(f"{result['model']:<32}{result['bytes'] / 1024:>10.1f}{format_time(result['parse_raw']):>12}"
+              f"{format_time(result['parse_obj']):>12}{format_time(result['json']):>12}"
+              f"{format_time(result['dict']):>12}{result['memory'] / 1024:>10.1f}", flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"time": datetime.now(tz=timezone.utc).isoformat(), "repeat": args.repeat,
+                                   "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
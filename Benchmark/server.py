@@ -0,0 +1,94 @@
+"""
+基准测试用的服务器启动与考试构造工具
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from pathlib import Path
+from typing import Iterator
+
+import httpx
+
+from Core.models import Exam, Student
+from Benchmark.grading import make_paper
+
+ROOT = Path(__file__).resolve().parent.parent
+ADMIN_PASSWORD = sha256(b"admin").hexdigest()
+STUDENT_PASSWORD = sha256(b"password").hexdigest()  # 客户端提交的密码摘要
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def start_server(workers: int = 1, port: int | None = None) -> Iterator[str]:
+    """
+    在临时目录中启动一个服务器进程，退出时关闭
+
+    参数：
+        workers(int): 工作进程数
+        port(int): 监听端口，为None时自动选择
+
+    返回：
+        str: 服务器地址
+    """
+    port = port or free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, "database"))
+        env = dict(os.environ, PYTHONPATH=str(ROOT))
+        process = subprocess.Popen([sys.executable, "-m", "Server.main", "--host", "127.0.0.1", "--port", str(port),
+                                    "--workers", str(workers)],
+                                   cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        address = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(300):
+                try:
+                    httpx.get(f"{address}/docs", timeout=1)
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("服务器启动超时")
+            time.sleep(0.5 if workers > 1 else 0)  # 等待其余工作进程就绪
+            yield address
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def make_exam(students: int, questions: int = 50, duration: float = 3600) -> Exam:
+    """
+    生成一场已经开始的考试，考生uid从1开始编号
+    """
+    now = datetime.now(tz=timezone.utc)
+    return Exam(paper=make_paper(questions), title="基准测试考试", start_time=now,
+                end_time=now + timedelta(seconds=duration),
+                student_list=[Student(uid=str(uid), nickname=f"考生{uid}", password=STUDENT_PASSWORD)
+                              for uid in range(1, students + 1)])
+
+
+def no_cookies() -> CookieJar:
+    """
+    不保存任何cookie的CookieJar，多个模拟考生共用一个客户端时各自通过请求头携带cookie
+    """
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+
+def set_exam(address: str, exam: Exam) -> None:
+    with httpx.Client(base_url=address, timeout=60) as client:
+        response = client.post("/api/v1/admin_login", json={"uid": "0", "password": ADMIN_PASSWORD})
+        response.raise_for_status()
+        client.post("/api/v1/set_exam", content=exam.json()).raise_for_status()
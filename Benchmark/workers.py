@@ -0,0 +1,89 @@
+"""
+多进程服务基准测试：分别以1个和N个工作进程启动服务器，测量考生从登录到交卷整条流程的吞吐量
+
+用法（在仓库根目录下）：
+    python -m Benchmark.workers --students 2000 --workers 4 --concurrency 200
+"""
+import asyncio
+import os
+import random
+import time
+from argparse import ArgumentParser
+from statistics import quantiles
+
+import httpx
+
+from Core.models import AnswerSheet, Student
+from Benchmark.grading import make_answers
+from Benchmark.server import start_server, make_exam, set_exam, no_cookies, STUDENT_PASSWORD, ADMIN_PASSWORD
+
+
+async def student_flow(client: httpx.AsyncClient, exam, uid: str) -> None:
+    response = await client.post("/api/v1/login", json={"uid": uid, "password": STUDENT_PASSWORD})
+    if "token" not in response.cookies:
+        raise RuntimeError(f"考生 {uid} 登录失败：{response.text}")
+    cookie = {"Cookie": f"token={response.cookies['token']}"}
+    sheet = AnswerSheet(student=Student(uid=uid, nickname="", password=""), exam_id=exam.uuid,
+                        answers=make_answers(exam.paper))
+    response = await client.post("/api/v1/upload_sheet", content=sheet.json(), headers=cookie)
+    if response.json()["recode"] != 200:
+        raise RuntimeError(f"考生 {uid} 交卷失败：{response.text}")
+
+
+async def drive(address: str, exam, concurrency: int) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=address, cookies=no_cookies(), limits=limits, timeout=120) as client:
+        async def one(uid: str) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await student_flow(client, exam, uid)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(student.uid) for student in exam.student_list])
+        return time.perf_counter() - start, latencies
+
+
+def verify(address: str, exam, samples: int = 20) -> None:
+    # 随机抽查成绩，确认任一进程都能看到其他进程收到的答题卡
+    with httpx.Client(base_url=address, timeout=60) as client:
+        client.post("/api/v1/admin_login", json={"uid": "0", "password": ADMIN_PASSWORD})
+        time.sleep(0.1)
+        for student in random.sample(exam.student_list, min(samples, len(exam.student_list))):
+            response = client.get("/api/v1/get_student_score", params={"student_uid": student.uid}).json()
+            if response["recode"] != 200:
+                raise RuntimeError(f"考生 {student.uid} 的成绩不可见：{response}")
+
+
+def bench(workers: int, students: int, concurrency: int) -> dict:
+    exam = make_exam(students)
+    with start_server(workers) as address:
+        set_exam(address, exam)
+        time.sleep(0.2)  # 等待各工作进程同步考试
+        elapsed, latencies = asyncio.run(drive(address, exam, concurrency))
+        verify(address, exam)
+    cuts = quantiles(latencies, n=100, method="inclusive")
+    return {"workers": workers, "elapsed": elapsed, "throughput": students / elapsed,
+            "p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def main() -> None:
+    parser = ArgumentParser(description="比较单进程与多进程服务的登录到交卷吞吐量")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    for workers in sorted({1, args.workers}):
+        result = bench(workers, args.students, args.concurrency)
+        print(f"{result['workers']} 个工作进程：{args.students} 名考生用时 {result['elapsed']:.2f} s，"
+              f"吞吐量 {result['throughput']:.0f} 人/s，"
+              f"p50 {result['p50'] * 1000:.0f} ms，p95 {result['p95'] * 1000:.0f} ms，p99 {result['p99'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
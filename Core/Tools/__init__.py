@@ -1,43 +1,20 @@
 from pathlib import Path
-from hashlib import sha256
-
-import pandas as pd
-
 from Core.models import Student
+from Core.Tools.network import NetworkWorker
+from Core.Tools.paperfile import dump_paper, load_paper, PaperReader, encode_question, pack_paper, write_atomic, CODEC
+from Core.Tools.roster import iter_students, ImportReport, hash_password
+from Core.Tools.encryption import derive_password, verify_password, is_derived, student_salt
 
 
-def excel_to_students(file: Path) -> list[Student]:
+def excel_to_students(file: Path, report: ImportReport | None = None) -> list[Student]:
     """
-    从Excel表格读取数据并转换为list[Student]
+    从Excel表格读取数据并转换为list[Student]，大表格请直接使用iter_students逐个处理
 
     参数：
         file(Path): Excel表格文件路径
+        report(ImportReport): 导入报告，有误的行记入其中
 
     返回：
         list[Student]: 转换完毕的学生对象列表
     """
-    # 读取Excel文件
-    df = pd.read_excel(file)
-
-    # 列名映射（如果Excel列名与类字段名不同）
-    column_mapping = {
-        '学号': 'uid',
-        '姓名': 'nickname',
-        '密码': 'password'
-    }
-    df = df.rename(columns=column_mapping)
-
-    # 将DataFrame转换为Student对象列表
-    students = []
-    for _, row in df.iterrows():
-        try:
-            student = Student(
-                uid=int(row['uid']),
-                nickname=str(row['nickname']),
-                password=sha256(str(row['password']).strip().encode("utf-8")).hexdigest()
-            )
-            students.append(student)
-        except Exception as e:
-            print(f"Error creating student from row {_}: {e}")
-
-    return students
+    return list(iter_students(file, report))
@@ -1,4 +1,51 @@
 from numpy import array
+from hashlib import pbkdf2_hmac, sha256
+from hmac import compare_digest
+import os
 
+KDF_PREFIX = "pbkdf2_sha256"
+KDF_ITERATIONS = 20000  # 单次派生或校验约10毫秒，导入名单时在线程池中派生，登录时在线程池中校验
+KDF_SALT_BYTES = 16
 
 
+def derive_password(digest: str, iterations: int = KDF_ITERATIONS, salt: bytes | None = None) -> str:
+    """
+    由客户端提交的密码摘要（sha256十六进制）派生保存在名单中的密码哈希
+    :param digest: 密码的sha256十六进制摘要，不区分大小写
+    :param iterations: PBKDF2迭代次数
+    :param salt: 盐，为None时随机生成
+    :return: pbkdf2_sha256$<迭代次数>$<盐>$<哈希>格式的字符串
+    """
+    salt = salt if salt is not None else os.urandom(KDF_SALT_BYTES)
+    derived = pbkdf2_hmac("sha256", digest.lower().encode("utf-8"), salt, iterations)
+    return f"{KDF_PREFIX}${iterations}${salt.hex()}${derived.hex()}"
+
+
+def student_salt(uid: str) -> bytes:
+    """
+    由学号确定的盐：各考生的盐互不相同，同一考生重复导入时得到相同的哈希，考生库可以按字符串比较出未变的行
+    :param uid: 考生uid
+    :return: 盐
+    """
+    return sha256(f"latexam-student:{uid}".encode("utf-8")).digest()[:KDF_SALT_BYTES]
+
+
+def is_derived(stored: str) -> bool:
+    return stored.startswith(f"{KDF_PREFIX}$")
+
+
+def verify_password(stored: str, digest: str) -> bool:
+    """
+    校验客户端提交的密码摘要，兼容直接保存sha256摘要的旧名单；派生哈希的校验较慢，不应在事件循环中调用
+    :param stored: 名单中保存的密码
+    :param digest: 客户端提交的密码摘要
+    :return: 密码正确时返回True
+    """
+    if not is_derived(stored):
+        return compare_digest(stored.upper().encode("utf-8"), digest.upper().encode("utf-8"))
+    try:
+        _, iterations, salt, derived = stored.split("$")
+        expected = derive_password(digest, int(iterations), bytes.fromhex(salt))
+    except ValueError:
+        return False
+    return compare_digest(expected.encode("utf-8"), stored.encode("utf-8"))
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+
+class NetworkWorker:
+    """
+    客户端的网络线程：在专用线程中运行事件循环和一个保持连接的httpx.AsyncClient
+
+    界面线程通过submit提交请求函数，立即得到一个Future，不会等待网络往返。
+    请求完成后回调在网络线程中执行，由调用方通过Qt信号转交界面线程处理。
+    """
+    def __init__(self, timeout: float = 10.0, max_connections: int = 10):
+        self.timeout: httpx.Timeout = httpx.Timeout(timeout)
+        self.limits: httpx.Limits = httpx.Limits(max_connections=max_connections,
+                                                 max_keepalive_connections=max_connections)
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self.client: httpx.AsyncClient | None = None
+        self.pending: set[Future] = set()  # 尚未完成的请求，断开连接时一并取消
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="LatexamNetwork", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        self.ready.set()
+        self.loop.run_forever()
+
+    def submit(self, function: Callable[[httpx.AsyncClient], Awaitable[Any]],
+               callback: Callable[[Any, BaseException | None], None] | None = None) -> Future:
+        """
+        在网络线程中执行一个请求
+        :param function: 以AsyncClient为参数的协程函数
+        :param callback: 完成后调用callback(结果, 异常)，成功时异常为None；请求被取消时不调用
+        :return: 可用于取消请求的Future
+        """
+        future = asyncio.run_coroutine_threadsafe(function(self.client), self.loop)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        if callback is not None:
+            future.add_done_callback(lambda done: None if done.cancelled() else
+                                     callback(None if done.exception() else done.result(), done.exception()))
+        return future
+
+    def cancel(self) -> None:
+        """
+        取消所有未完成的请求，并清除登录获得的cookie
+        :return: 无
+        """
+        for future in list(self.pending):
+            future.cancel()
+        self.loop.call_soon_threadsafe(self.client.cookies.clear)
+
+    def close(self) -> None:
+        """
+        取消未完成的请求，关闭连接池并结束网络线程
+        :return: 无
+        """
+        for future in list(self.pending):
+            future.cancel()
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
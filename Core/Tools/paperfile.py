@@ -0,0 +1,174 @@
+import os
+import struct
+import zlib
+from pathlib import Path
+
+import ujson as json
+
+from Core.models import Paper, Question
+
+try:
+    import zstandard
+except ImportError:  # 未安装zstandard时以zlib压缩，读取zstd压缩的试卷时才报错
+    zstandard = None
+
+MAGIC = b"LEPB"
+VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+# 文件头：魔数、版本、压缩方式、保留、索引长度；随后是JSON索引，再之后是各题压缩后的数据
+HEADER = struct.Struct("<4sBBHI")
+CODEC = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB  # 写入时使用的压缩方式
+
+
+def _compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("该试卷使用zstd压缩，请先安装zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f"未知的压缩方式：{codec}")
+
+
+def encode_question(question: Question) -> bytes:
+    """
+    序列化并压缩单道题目，得到.lep文件中该题的数据段
+    :param question: 题目
+    :return: 压缩后的数据段
+    """
+    return _compress(question.json().encode("utf-8"), CODEC)
+
+
+def dumps_paper(paper: Paper) -> bytes:
+    """
+    将试卷序列化为二进制.lep格式，每道题单独压缩，索引中记录各题的偏移和长度
+    :param paper: 试卷
+    :return: 文件内容
+    """
+    return pack_paper(paper.serial_number, paper.title, [encode_question(question) for question in paper.questions])
+
+
+def pack_paper(serial_number: int, title: str, sections: list[bytes]) -> bytes:
+    """
+    由各题的数据段组装.lep文件，未修改的题目可以直接复用上次的数据段
+    :param serial_number: 试卷序列号
+    :param title: 试卷标题
+    :param sections: 各题由encode_question得到的数据段
+    :return: 文件内容
+    """
+    offsets = []
+    offset = 0
+    for section in sections:
+        offsets.append([offset, len(section)])
+        offset += len(section)
+    index = json.dumps({"serial_number": serial_number, "title": title, "questions": offsets},
+                       ensure_ascii=False).encode("utf-8")
+    return b"".join([HEADER.pack(MAGIC, VERSION, CODEC, 0, len(index)), index, *sections])
+
+
+def write_atomic(path: str | Path, data: bytes) -> None:
+    """
+    原子地写入文件，写入中途崩溃不会损坏原文件
+    :param path: 文件路径
+    :param data: 文件内容
+    :return: 无
+    """
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+
+def dump_paper(paper: Paper, path: str | Path) -> None:
+    """
+    以二进制格式原子地保存试卷
+    :param paper: 试卷
+    :param path: 文件路径
+    :return: 无
+    """
+    write_atomic(path, dumps_paper(paper))
+
+
+def load_paper(path: str | Path) -> Paper:
+    """
+    读取.lep试卷，兼容旧版的JSON格式
+    :param path: 文件路径
+    :return: 试卷
+    """
+    with PaperReader(path) as reader:
+        if reader.legacy is not None:
+            return reader.legacy
+        return Paper.construct(serial_number=reader.serial_number, title=reader.title,
+                               questions=[reader.question(index) for index in range(len(reader))])
+
+
+class PaperReader:
+    """
+    二进制.lep试卷的随机读取器，只解析文件头和索引，按需解压单道题目
+
+    打开旧版JSON格式的文件时整卷解析，legacy为解析出的试卷，其余接口照常可用。
+    """
+    def __init__(self, path: str | Path):
+        self.file = open(path, "rb")
+        self.legacy: Paper | None = None
+        self.codec: int = 0  # 旧版JSON格式为0
+        prefix = self.file.read(HEADER.size)
+        if len(prefix) < HEADER.size or prefix[:4] != MAGIC:
+            self.file.seek(0)
+            self.legacy = Paper.parse_raw(self.file.read())
+            self.serial_number: int = self.legacy.serial_number
+            self.title: str = self.legacy.title
+            self.offsets: list[list[int]] = []
+            return
+        _, version, self.codec, _, index_length = HEADER.unpack(prefix)
+        if version > VERSION:
+            self.file.close()
+            raise ValueError(f"试卷格式版本{version}过新，请更新Latexam")
+        index = json.loads(self.file.read(index_length))
+        self.serial_number = index["serial_number"]
+        self.title = index["title"]
+        self.offsets = index["questions"]
+        self.base: int = HEADER.size + index_length  # 题目数据的起始位置
+
+    def __len__(self) -> int:
+        return len(self.legacy.questions) if self.legacy is not None else len(self.offsets)
+
+    def __enter__(self) -> "PaperReader":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def question(self, index: int) -> Question:
+        """
+        读取单道题目，不解析其他题目
+        :param index: 题号（从0开始）
+        :return: 题目
+        """
+        if self.legacy is not None:
+            return self.legacy.questions[index]
+        return Question.parse_raw(_decompress(self.section(index), self.codec))
+
+    def section(self, index: int) -> bytes:
+        """
+        读取单道题目压缩后的数据段，不解压
+        :param index: 题号（从0开始）
+        :return: 数据段，旧版JSON格式时为空
+        """
+        if self.legacy is not None:
+            return b""
+        offset, length = self.offsets[index]
+        self.file.seek(self.base + offset)
+        return self.file.read(length)
+
+    def close(self) -> None:
+        self.file.close()
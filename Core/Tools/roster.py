@@ -0,0 +1,149 @@
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from Core.models import Student
+from Core.Tools.encryption import derive_password, student_salt
+
+# 表头到Student字段的映射
+COLUMN_MAPPING = {
+    '学号': 'uid',
+    '姓名': 'nickname',
+    '密码': 'password'
+}
+CHUNK_ROWS = 5000  # 每次读取并处理的行数
+PARALLEL_MIN_ROWS = 64  # 一块不少于该行数时才在线程池中计算密码哈希
+
+
+def hash_password(uid: str, password: str) -> str:
+    """
+    计算导入名单时保存的密码哈希（客户端提交的sha256摘要再经PBKDF2派生），在线程池中调用
+
+    盐由学号确定（见student_salt），同一考生重复导入时哈希不变，考生库的差异导入不会把每一行都视为有变化。
+    """
+    return derive_password(sha256(password.encode("utf-8")).hexdigest(), salt=student_salt(uid))
+
+
+class ImportReport:
+    """
+    名单导入报告，记录成功导入的人数和每一行的错误
+    """
+    def __init__(self):
+        self.imported: int = 0
+        self.errors: list[tuple[int, str]] = []  # Excel中的行号（从1开始，含表头）和错误原因
+
+    @property
+    def ok(self) -> bool:
+        """
+        导入没有任何错误行
+        """
+        return not self.errors
+
+    def add_error(self, row: int, message: str) -> None:
+        self.errors.append((row, message))
+
+    def summary(self, limit: int = 20) -> str:
+        """
+        生成可读的导入结果
+        :param limit: 最多列出的错误条数
+        :return: 导入结果文本
+        """
+        lines = [f"成功导入 {self.imported} 名考生，{len(self.errors)} 行有误。"]
+        lines += [f"第 {row} 行：{message}" for row, message in self.errors[:limit]]
+        if len(self.errors) > limit:
+            lines.append(f"……另有 {len(self.errors) - limit} 行有误")
+        return "\n".join(lines)
+
+
+def read_chunks(file: Path, chunk_rows: int = CHUNK_ROWS) -> Iterator[tuple[int, pd.DataFrame]]:
+    """
+    以只读模式逐块读取工作簿第一张表，不把整张表载入内存
+    :param file: Excel表格文件路径
+    :param chunk_rows: 每块的行数
+    :return: （块中第一行的行号，以表头为列名的DataFrame）的迭代器
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else "" for name in next(rows, ())]
+        start = 2
+        chunk = []
+        for row in rows:
+            chunk.append(row[:len(header)])
+            if len(chunk) == chunk_rows:
+                yield start, pd.DataFrame(chunk, columns=header, dtype=object)
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            yield start, pd.DataFrame(chunk, columns=header, dtype=object)
+    finally:
+        workbook.close()
+
+
+def normalize(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    以向量化操作规范化一块名单：学号去掉Excel数字格式的小数部分，各列去除首尾空白
+    :param df: read_chunks得到的一块
+    :return: 规范化后的uid、nickname、password三列，以及每行的错误原因（无误为None）
+    """
+    df = df.rename(columns=COLUMN_MAPPING)
+    if missing := [name for name, field in COLUMN_MAPPING.items() if field not in df.columns]:
+        raise ValueError(f"表格缺少列：{'、'.join(missing)}")
+    result = pd.DataFrame({
+        "uid": df["uid"].astype("string").str.strip().str.replace(r"\.0+$", "", regex=True),
+        "nickname": df["nickname"].astype("string").str.strip(),
+        "password": df["password"].astype("string").str.strip()
+    })
+    errors = pd.Series(None, index=df.index, dtype=object)
+    errors[result["password"].isna() | (result["password"] == "")] = "密码为空"
+    errors[result["nickname"].isna() | (result["nickname"] == "")] = "姓名为空"
+    errors[~result["uid"].str.fullmatch(r"\d+").fillna(False).astype(bool)] = "学号不是数字"
+    return result, errors
+
+
+def iter_students(file: Path, report: ImportReport | None = None, chunk_rows: int = CHUNK_ROWS,
+                  executor: Executor | None = None) -> Iterator[Student]:
+    """
+    流式导入名单：逐块读取、向量化校验，在线程池中计算密码哈希，按需逐个生成Student
+
+    参数：
+        file(Path): Excel表格文件路径
+        report(ImportReport): 导入报告，有误的行记入其中并跳过
+        chunk_rows(int): 每块的行数
+        executor(Executor): 计算密码哈希的执行器，为None时按需创建线程池
+
+    返回：
+        Iterator[Student]: 学生对象的迭代器
+    """
+    report = report if report is not None else ImportReport()
+    owned = None
+    seen: set[str] = set()
+    try:
+        for start, chunk in read_chunks(file, chunk_rows):
+            students, errors = normalize(chunk)
+            ok = errors.isna()
+            duplicated = (students["uid"].where(ok).duplicated() | students["uid"].isin(seen)) & ok
+            errors[duplicated] = "学号重复"
+            for position, error in errors.dropna().items():
+                report.add_error(start + position, error)
+            valid = students[errors.isna()]
+            seen.update(valid["uid"])
+            uids, passwords = valid["uid"].tolist(), valid["password"].tolist()
+            if len(passwords) >= PARALLEL_MIN_ROWS:
+                if executor is None:
+                    # PBKDF2计算时释放GIL，线程池即可并行，无需启动导入pandas的子进程、传递参数
+                    executor = owned = ThreadPoolExecutor(max_workers=os.cpu_count())
+                hashes = executor.map(hash_password, uids, passwords)
+            else:
+                hashes = map(hash_password, uids, passwords)
+            for uid, nickname, password in zip(valid["uid"], valid["nickname"], hashes):
+                report.imported += 1
+                yield Student(uid=uid, nickname=nickname, password=password)
+    finally:
+        if owned is not None:
+            owned.shutdown()
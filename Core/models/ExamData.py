@@ -1,6 +1,9 @@
 from datetime import datetime
+from hashlib import sha256
 from uuid import uuid1
 
+from ujson import dumps
+
 from Core.models.BaseModel import BaseModel
 
 
@@ -49,6 +52,35 @@ class Student(BaseModel):
     password: str
 
 
+class StudentOption(BaseModel):
+    text: str
+
+
+class StudentQuestion(BaseModel):
+    title: str
+    type: str
+    score: int
+    options: list[StudentOption]
+
+
+class StudentPaper(BaseModel):
+    serial_number: int
+    title: str
+    questions: list[StudentQuestion]
+
+
+class StudentExam(BaseModel):
+    """
+    考生可见的考试信息，不含考生名单、正确选项和判题标准
+    """
+    paper: StudentPaper
+    title: str
+    start_time: datetime
+    end_time: datetime
+    uuid: str
+    version: int = 0  # 考试的修改版本，见Exam.version
+
+
 class Exam(BaseModel):
     paper: Paper  # 考试使用的考卷
     title: str  # 考试标题
@@ -56,9 +88,35 @@ class Exam(BaseModel):
     end_time: datetime  # 结束时间
     student_list: list[Student]  # 考试人员列表
     uuid: str = uuid1().hex
+    version: int = 0  # 每次增量修改（PATCH）加1，缓存以此区分同一场考试的不同版本
+
+    def to_student_exam(self) -> StudentExam:
+        """
+        生成发给考生的考试信息，去掉考生名单与答案
+        """
+        return StudentExam(
+            paper=StudentPaper(
+                serial_number=self.paper.serial_number,
+                title=self.paper.title,
+                questions=[StudentQuestion(title=question.title, type=question.type, score=question.score,
+                                           options=[StudentOption(text=option.text) for option in question.options])
+                           for question in self.paper.questions]
+            ),
+            title=self.title,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            uuid=self.uuid,
+            version=self.version
+        )
 
 
 class AnswerSheet(BaseModel):
     student: Student
     exam_id: str
     answers: list[str]
+
+    def digest(self) -> str:
+        """
+        答案的摘要，客户端与服务器据此确认双方保存的作答一致
+        """
+        return sha256(dumps(self.answers, ensure_ascii=False).encode("utf-8")).hexdigest()
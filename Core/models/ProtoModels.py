@@ -1,5 +1,5 @@
 from .BaseModel import BaseModel
-from .ExamData import Student
+from .ExamData import Student, Question
 from datetime import datetime
 
 from typing import Any
@@ -24,6 +24,38 @@ class ScoreData(BaseData):
     score: int
 
 
+class QuestionScoreData(BaseData):
+    index: int  # 题号（从0开始）
+    scores: dict[str, int]  # uid为key，本题得分为value
+
+
+class AnswerPatchData(BaseData):
+    answers: dict[int, str]  # 题号（从0开始）为key，该题最新的作答为value
+
+
+class FinalizeData(BaseData):
+    digest: str  # 客户端完整答题卡的摘要，见AnswerSheet.digest
+
+
+class ExamPatchData(BaseData):
+    version: int | None = None  # 客户端所知的考试版本，与服务器不一致时拒绝修改
+    title: str | None = None
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+
+
+class RosterPatchData(BaseData):
+    version: int | None = None
+    add: list[Student] = []  # 加入或更新的考生
+    remove: list[str] = []  # 移出名单的考生uid
+
+
+class QuestionErrataData(BaseData):
+    version: int | None = None
+    index: int  # 题号（从0开始）
+    question: Question  # 勘误后的题目，题目类型不能改变
+
+
 class Results(BaseModel):
     recode: int = 200
     error: str = None
@@ -40,6 +72,22 @@ class ScoreResult(Results):
     score: int
 
 
+class QuestionAnswer(BaseModel):
+    uid: str
+    answer: str
+    score: int | None = None  # 已批改时为本题得分
+
+
+class PaperManifest(BaseModel):
+    """
+    分块下载考试信息用的清单，各块依次拼接即为get_exam_info的响应体
+    """
+    digest: str  # 完整响应体的sha256
+    size: int  # 完整响应体的字节数
+    chunk_size: int  # 除最后一块外每块的字节数
+    chunks: list[str]  # 各块的sha256
+
+
 class StudentToken(BaseModel):
     student: Student
     exam_id: str
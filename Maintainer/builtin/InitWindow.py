@@ -1,4 +1,5 @@
 import os
+import re
 import ipaddress
 import socket
 import ujson as json
@@ -6,6 +7,8 @@ import hashlib
 import httpx
 import time
 from datetime import timezone
+import asyncio
+from concurrent.futures import Future
 from tzlocal import get_localzone
 from subprocess import run
 
@@ -18,6 +21,7 @@ from PySide6.QtWidgets import (
     QWidget,
     QFileDialog,
     QInputDialog,
+    QProgressDialog,
 )
 
 from PySide6.QtGui import QAction
@@ -25,11 +29,14 @@ from PySide6.QtGui import QAction
 from .AboutWindow import Ui_AboutWindow
 from .LatexamWindow import Ui_LatexamWindow
 from .LoginDialog import Ui_LoginWindow
+from .PaperEditor import PaperEditor
 
 from Core.models import *
 from Core.Tools import *
 
 VERSION = "v1.0.0 Alpha"
+MARK_PAGE_SIZE = 50  # 按题批卷时每页获取的答题卡数量
+SRC_PATTERN = re.compile(r"""(\bsrc\s*=\s*)(["'])(.*?)\2""")  # 题目HTML中的src="..."引用
 local_timezone = get_localzone()
 
 
@@ -39,12 +46,14 @@ class LatexamSignal(QObject):
     set_output_box = Signal(str)
     append_output_box = Signal(str)
     clear_output_box = Signal()
+    network_done = Signal(object, object, object)  # 回调、结果、异常，网络请求完成后在界面线程调用回调
+    progress = Signal(int)  # 下载进度（百分比）
 
 
 class LatexamApplication(QMainWindow):
     child_window: QWidget
 
-    client: httpx.Client
+    network: NetworkWorker
     address: str = ""
     password: str = ""
     online: bool = False
@@ -52,10 +61,19 @@ class LatexamApplication(QMainWindow):
     sheet: AnswerSheet
     paper: Paper
     paper_path: str = ""
+    editor: PaperEditor | None = None  # 试卷编辑模式下的编辑模型，负责自动保存与撤销
     exam: Exam
+    exam_etag: str = ""  # 上次获取的考试信息的ETag，用于条件请求
+    exam_cache: Exam | None = None  # 上次获取的考试信息
     score_list: list[int]
 
-    mode: str = ""  # paper是试卷编辑模式，exam是考试编辑模式，mark是批改试卷模式
+    answer_page: list[QuestionAnswer]  # 按题批卷时当前页的考生作答
+    page_scores: dict[str, int]  # 按题批卷时当前页的打分，uid为key
+    mark_question: int = -1  # 按题批卷时正在批改的题号
+    prefetch: Future | None = None  # 按题批卷时正在预取的下一页
+    progress_dialog: QProgressDialog | None = None  # 导出成绩时的进度对话框
+
+    mode: str = ""  # paper是试卷编辑模式，exam是考试编辑模式，mark是批改试卷模式，markq是按题批卷模式
     index: int = -1
     option_index: int = 0  # 选项索引
     status: str = ""  # 编辑指示器，指示正在编辑的对象
@@ -77,18 +95,24 @@ class LatexamApplication(QMainWindow):
         if not os.path.exists("papers/"):
             os.mkdir("papers")
 
+        self.network = NetworkWorker()
+
     def bind(self):
         self.signal.set_input_box.connect(self.ui.input_message.setPlainText)
         self.signal.clear_input_box.connect(self.ui.input_message.clear)
         self.signal.set_output_box.connect(self.ui.output_message.setText)
         self.signal.append_output_box.connect(self.ui.output_message.append)
         self.signal.clear_output_box.connect(self.ui.output_message.clear)
+        self.signal.network_done.connect(lambda callback, result, error: callback(result, error))
 
     def closeEvent(self, event) -> None:
         dialog = QMessageBox.warning(self, "Latexam - 警告", "你真的要退出Latexam管理系统吗？\n"
                                                              "所有未保存更改都会消失！",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if dialog == QMessageBox.Yes:
+            if self.editor is not None:
+                self.editor.close()
+            self.network.close()
             event.accept()
         else:
             event.ignore()
@@ -113,36 +137,70 @@ class LatexamApplication(QMainWindow):
                 self.onEditExam()
             case "批改考试试卷":
                 self.onMarkExam()
+            case "按题批改试卷":
+                self.onMarkQuestion()
             case "查询分数":
                 self.onGetScore()
+            case "导出成绩":
+                self.onExportScores()
+            case "导入考生库":
+                self.onImportStudents()
+            case "撤销":
+                self.onUndo()
+            case "重做":
+                self.onRedo()
             case "关于Latexam":
                 self.child_window = AboutApplication()
                 self.child_window.show()
             case "帮助":
                 run("hh.exe LatexamMaintainer.chm", shell=True)
 
-    def onConnect(self) -> bool:
+    def request(self, function, callback) -> Future:
         """
-        执行登录操作，返回是否成功
-        :return: 成功返回True，否则返回False
+        在网络线程中执行请求，完成后在界面线程调用callback(结果, 异常)
+        :param function: 以httpx.AsyncClient为参数的协程函数
+        :param callback: 回调函数
+        :return: 可用于取消请求的Future
+        """
+        return self.then(self.network.submit(function), callback)
+
+    def then(self, future: Future, callback) -> Future:
+        """
+        请求完成后在界面线程调用callback(结果, 异常)，请求被取消时不调用
+        :param future: 网络线程返回的Future
+        :param callback: 回调函数
+        :return: future本身
+        """
+        future.add_done_callback(lambda done: None if done.cancelled() else self.signal.network_done.emit(
+            callback, None if done.exception() else done.result(), done.exception()))
+        return future
+
+    def onConnect(self) -> None:
         """
-        self.client = httpx.Client()
-        response = LoginResults.parse_obj(self.client.post(f"{self.address}/api/v1/admin_login",
-                                                           json=LoginData(uid=0, password=self.password)
-                                                           .dict()).json())
-        if response.success:
+        在网络线程中执行登录操作，完成后由onConnected处理结果
+        :return: 无
+        """
+        self.setWindowTitle(f"Latexam 考试系统管理面板 {VERSION} - 正在连接")
+        login = LoginData(uid=0, password=self.password)
+
+        async def connect(client: httpx.AsyncClient) -> LoginResults:
+            return LoginResults.parse_obj((await client.post(f"{self.address}/api/v1/admin_login",
+                                                             json=login.dict())).json())
+
+        self.request(connect, self.onConnected)
+
+    def onConnected(self, response: LoginResults | None, error: BaseException | None) -> None:
+        if error is None and response.success:
             self.setWindowTitle(f"Latexam 考试系统管理面板 {VERSION} - 在线")
             self.online = True
-            return True
-        else:
-            QMessageBox.warning(self, "Latexam - 警告", f"无法登录到 Latexam 服务器。\n"
-                                                        f"服务器报告的信息：{response.msg}")
-            self.setWindowTitle(f"Latexam 考试系统管理面板 {VERSION} - 离线")
-            self.client.close()
-            self.online = False
-            self.address = ""
-            self.password = ""
-            return False
+            return
+        QMessageBox.warning(self, "Latexam - 警告", f"无法登录到 Latexam 服务器。\n"
+                                                    f"服务器报告的信息：{error or response.msg}")
+        self.setWindowTitle(f"Latexam 考试系统管理面板 {VERSION} - 离线")
+        self.network.cancel()
+        self.online = False
+        self.address = ""
+        self.password = ""
 
     def onDisconnect(self) -> None:
         """
@@ -155,7 +213,7 @@ class LatexamApplication(QMainWindow):
         if dialog == QMessageBox.Yes:
             self.setWindowTitle(f"Latexam 考试系统管理面板 {VERSION} - 离线")
             self.online = False
-            self.client.close()
+            self.network.cancel()
             self.address = ""
             self.password = ""
 
@@ -173,8 +231,7 @@ class LatexamApplication(QMainWindow):
         if not (number := QInputDialog.getText(self, "Latexam - 新建试卷", "请输入试卷序列号")[0]):
             return
         new_paper = Paper(serial_number=number, title=title, questions=[])
-        with open(os.path.join(directory, "paper.lep"), "w", encoding="utf-8") as file:
-            file.write(json.dumps(new_paper.dict(), ensure_ascii=False))
+        dump_paper(new_paper, os.path.join(directory, "paper.lep"))
         QMessageBox.information(self, "Latexam - 新建试卷", f"试卷 {title} 已创建，"
                                                             f"序列号为 {number}，\n"
                                                             f"保存目录为 {directory}。\n"
@@ -186,9 +243,11 @@ class LatexamApplication(QMainWindow):
         if not (os.path.exists(os.path.join(directory, "paper.lep"))):
             QMessageBox.critical(self, "Latexam - 错误", "该目录不是试卷工程目录！")
             return
-        with open(os.path.join(directory, "paper.lep"), "r", encoding="utf-8") as file:
-            self.paper = Paper.parse_raw(file.read())
-            self.paper_path = directory
+        if self.editor is not None:
+            self.editor.close()
+        self.editor = PaperEditor(os.path.join(directory, "paper.lep"))
+        self.paper = self.editor.paper
+        self.paper_path = directory
         self.index = -1
         self.ui.text_status.setText("首页")
         self.signal.set_output_box.emit(f"<h2>{self.paper.title}</h2>"
@@ -206,9 +265,37 @@ class LatexamApplication(QMainWindow):
         if not self.paper_path and self.mode != "paper":
             QMessageBox.warning(self, "Latexam - 警告", "没有试卷被打开。")
             return
-        with open(os.path.join(self.paper_path, "paper.lep"), "w", encoding="utf-8") as file:
-            file.write(self.paper.json())
-            QMessageBox.information(self, "Latexam - 保存试卷", f"试卷 {self.paper.title} 已保存。")
+        self.editor.save()
+        QMessageBox.information(self, "Latexam - 保存试卷", f"试卷 {self.paper.title} 已保存。")
+
+    def onUndo(self) -> None:
+        if self.mode != "paper" or self.editor is None:
+            return
+        if (index := self.editor.undo()) is None:
+            QMessageBox.information(self, "Latexam - 撤销", "没有可以撤销的修改。")
+            return
+        self.showQuestion(index)
+
+    def onRedo(self) -> None:
+        if self.mode != "paper" or self.editor is None:
+            return
+        if (index := self.editor.redo()) is None:
+            QMessageBox.information(self, "Latexam - 重做", "没有可以重做的修改。")
+            return
+        self.showQuestion(index)
+
+    def showQuestion(self, index: int) -> None:
+        """
+        试卷编辑模式下跳转到某道题目，题目已被删除时跳转到相邻的题目或首页
+        :param index: 题号（从0开始）
+        :return: 无
+        """
+        if not self.paper.questions:
+            self.index = 0
+            self.onPrevious()
+            return
+        self.index = min(index, len(self.paper.questions) - 1) - 1
+        self.onNext()
 
     def onEditExam(self) -> None:
         if not self.online:
@@ -225,9 +312,13 @@ class LatexamApplication(QMainWindow):
         self.ui.button_edit.setEnabled(True)
 
         self.mode = "exam"
-        request = self.client.get(url=f"{self.address}/api/v1/get_exam_info")
-        if request.status_code == 200:
-            exam_data = Exam.parse_obj(request.json()["data"])
+        self.request(self.getExamDetail, self.onExamLoaded)
+
+    def onExamLoaded(self, exam_data: Exam | None, error: BaseException | None) -> None:
+        if error is not None:
+            QMessageBox.warning(self, "Latexam - 警告", f"无法获取考试信息：{error}")
+            return
+        if exam_data is not None:
             self.signal.set_output_box.emit(f"<h2>{exam_data.title}</h2>"
                                             f"<p><font color='grey'>开始时间：{exam_data.start_time.astimezone(local_timezone)}</font></p>"
                                             f"<p><font color='grey'>结束时间：{exam_data.end_time.astimezone(local_timezone)}</font></p>")
@@ -243,6 +334,24 @@ class LatexamApplication(QMainWindow):
                 paper=Paper(serial_number=0, title="", questions=[])
             )
 
+    async def getExamDetail(self, client: httpx.AsyncClient) -> Exam | None:
+        """
+        获取完整考试信息，考试未变化时服务器返回304，直接使用上次获取的结果，在网络线程中执行
+        :param client: 网络线程的客户端
+        :return: 考试信息，考试未设定时返回None
+        """
+        headers = {"If-None-Match": self.exam_etag} if self.exam_etag else {}
+        request = await client.get(url=f"{self.address}/api/v1/get_exam_detail", headers=headers)
+        if request.status_code == 304 and self.exam_cache is not None:
+            return self.exam_cache.copy(deep=True)  # 返回副本，编辑考试时的本地修改不会污染缓存
+        if request.status_code != 200:
+            self.exam_etag = ""
+            self.exam_cache = None
+            return None
+        self.exam_etag = request.headers.get("ETag", "")
+        self.exam_cache = Exam.parse_obj(request.json()["data"])
+        return self.exam_cache.copy(deep=True)
+
     def onMarkExam(self) -> None:
         if not self.online:
             QMessageBox.warning(self, "Latexam - 警告", "请先连接到Latexam服务器。")
@@ -266,13 +375,26 @@ class LatexamApplication(QMainWindow):
 
         self.mode = "mark"
 
-        # 先获取考试信息
-        self.exam = Exam.parse_obj(self.client.get(url=f"{self.address}/api/v1/get_exam_info").json()["data"])
+        async def fetch(client: httpx.AsyncClient) -> tuple[Exam | None, httpx.Response]:
+            # 同时获取考试信息和考生的答题卡
+            return await asyncio.gather(self.getExamDetail(client),
+                                        client.get(url=f"{self.address}/api/v1/get_student_sheet",
+                                                   params={"student_uid": number}))
 
-        request = self.client.get(
-            url=f"{self.address}/api/v1/get_student_sheet",
-            params={"student_uid": number}
-        )
+        self.request(fetch, self.onSheetLoaded)
+
+    def onSheetLoaded(self, result: tuple[Exam | None, httpx.Response] | None, error: BaseException | None) -> None:
+        if error is not None:
+            QMessageBox.warning(self, "Latexam - 警告", f"无法获取答题卡：{error}")
+            return
+        exam, request = result
+        if exam is None:
+            QMessageBox.warning(self, "Latexam - 警告", "考试未设定。")
+            return
+        if request.json()["recode"] != 200:
+            QMessageBox.warning(self, "Latexam - 警告", f"无法获取答题卡：{request.json()['msg']}")
+            return
+        self.exam = exam
         self.sheet = AnswerSheet.parse_obj(request.json()["data"])
 
         self.signal.set_output_box.emit(f"<h2>{self.exam.title}</h2>"
@@ -283,6 +405,104 @@ class LatexamApplication(QMainWindow):
 
         self.score_list = [0] * len(self.sheet.answers)
 
+    def onMarkQuestion(self) -> None:
+        if not self.online:
+            QMessageBox.warning(self, "Latexam - 警告", "请先连接到Latexam服务器。")
+            return
+        self.index = -1
+        self.ui.input_message.setEnabled(False)
+        self.ui.button_send.setEnabled(False)
+        self.ui.button_next.setEnabled(False)
+        self.ui.button_previous.setEnabled(False)
+        self.ui.button_objective.setEnabled(False)
+        self.ui.button_subjective.setEnabled(False)
+        self.ui.button_edit.setEnabled(False)
+        self.request(self.getExamDetail, self.onMarkQuestionExam)
+
+    def onMarkQuestionExam(self, exam: Exam | None, error: BaseException | None) -> None:
+        if error is not None or exam is None:
+            QMessageBox.warning(self, "Latexam - 警告", f"无法获取考试信息：{error or '考试未设定'}")
+            return
+        self.exam = exam
+        subjective = [index for index, question in enumerate(self.exam.paper.questions) if question.type == "subjective"]
+        if not subjective:
+            QMessageBox.information(self, "Latexam - 按题批卷", "本场考试没有主观题，无需批卷。")
+            return
+        number, ok = QInputDialog.getInt(self, "Latexam - 按题批卷",
+                                         f"请输入要批改的主观题题号（{'、'.join(str(index + 1) for index in subjective)}）",
+                                         subjective[0] + 1, 1, len(self.exam.paper.questions), 1)
+        if not ok:
+            return
+        if number - 1 not in subjective:
+            QMessageBox.warning(self, "Latexam - 警告", f"第 {number} 题不是主观题。")
+            return
+
+        self.mode = "markq"
+        self.mark_question = number - 1
+        self.prefetch = self.fetchAnswers(self.mark_question, 0)
+        self.loadAnswerPage()
+
+    def fetchAnswers(self, index: int, offset: int) -> Future:
+        """
+        在网络线程中获取某道主观题一页的考生作答，用于预取下一页
+        :param index: 题号（从0开始）
+        :param offset: 本页起始位置
+        :return: 结果为(本页作答, 下一页起始位置, 答题卡总数)的Future
+        """
+        async def fetch(client: httpx.AsyncClient) -> tuple[list[QuestionAnswer], int, int]:
+            async with client.stream("GET", f"{self.address}/api/v1/get_question_answers",
+                                     params={"index": index, "offset": offset, "limit": MARK_PAGE_SIZE}) as response:
+                if "X-Next-Offset" not in response.headers:
+                    await response.aread()
+                    raise ValueError(response.json().get("msg") or response.json().get("detail"))
+                answers = [QuestionAnswer.parse_raw(line) async for line in response.aiter_lines() if line]
+                return answers, int(response.headers["X-Next-Offset"]), int(response.headers["X-Total-Count"])
+
+        return self.network.submit(fetch)
+
+    def loadAnswerPage(self) -> None:
+        """
+        预取的一页作答到达后载入，并开始预取下一页
+        :return: 无
+        """
+        self.then(self.prefetch, self.onAnswerPage)
+
+    def onAnswerPage(self, page: tuple[list[QuestionAnswer], int, int] | None, error: BaseException | None) -> None:
+        if error is not None:
+            QMessageBox.warning(self, "Latexam - 警告", f"无法获取考生作答：{error}")
+            self.mode = ""
+            return
+        self.answer_page, offset, total = page
+        if not self.answer_page:
+            self.prefetch = None
+            self.mode = ""
+            self.ui.input_message.setEnabled(False)
+            self.ui.button_send.setEnabled(False)
+            self.ui.button_next.setEnabled(False)
+            self.ui.button_previous.setEnabled(False)
+            self.signal.clear_input_box.emit()
+            self.signal.set_output_box.emit(f"<h2>{self.exam.title}</h2>"
+                                            f"<p>第 {self.mark_question + 1} 题已全部批改完毕。</p>")
+            return
+        # 批改本页的同时在后台预取下一页
+        self.prefetch = self.fetchAnswers(self.mark_question, offset)
+        self.page_scores = {answer.uid: answer.score or 0 for answer in self.answer_page}
+        question = self.exam.paper.questions[self.mark_question]
+        self.index = -1
+        self.ui.text_status.setText("首页")
+        self.ui.button_previous.setEnabled(False)
+        self.ui.button_next.setEnabled(True)
+        self.ui.button_send.setEnabled(False)
+        self.ui.input_message.setEnabled(False)
+        self.signal.clear_input_box.emit()
+        self.signal.set_output_box.emit(f"<h2>{self.exam.title}</h2>"
+                                        f"<h3>第 {self.mark_question + 1} 题（本小题{question.score}分）</h3>"
+                                        f"<p>{question.title}</p>"
+                                        f"<p><font color='grey'>判题标准：{question.judgement_reference}</font></p>"
+                                        f"<p><font color='grey'>本页为第 {offset - len(self.answer_page) + 1}～{offset} 份，"
+                                        f"共 {total} 份答题卡</font></p>"
+                                        f"<p>点击 <font color='blue'>下一题</font> 以开始批卷。</p>")
+
     def onGetScore(self) -> None:
         if not self.online:
             QMessageBox.warning(self, "Latexam - 警告", "请先连接到Latexam服务器。")
@@ -295,14 +515,110 @@ class LatexamApplication(QMainWindow):
         if not number.isdigit():
             QMessageBox.warning(self, "Latexam - 警告", "准考证号必须为数字。")
             return
-        request = self.client.get(
-            url=f"{self.address}/api/v1/get_student_score",
-            params={"student_uid": number}
-            )
-        if request.status_code == 200:
-            QMessageBox.information(self, "Latexam - 成绩", f"考生 {number} 的成绩为 {request.json()['score']} 分。")
-        else:
-            QMessageBox.warning(self, "Latexam - 警告", "无法获取成绩。")
+
+        async def fetch(client: httpx.AsyncClient) -> httpx.Response:
+            return await client.get(url=f"{self.address}/api/v1/get_student_score", params={"student_uid": number})
+
+        def done(request: httpx.Response | None, error: BaseException | None) -> None:
+            if error is None and request.status_code == 200 and request.json()["recode"] == 200:
+                QMessageBox.information(self, "Latexam - 成绩", f"考生 {number} 的成绩为 {request.json()['score']} 分。")
+            else:
+                QMessageBox.warning(self, "Latexam - 警告", "无法获取成绩。")
+
+        self.request(fetch, done)
+
+    def onExportScores(self) -> None:
+        """
+        将全部考生的成绩流式下载到CSV或XLSX文件，下载完成前写入临时文件
+        :return: 无
+        """
+        if not self.online:
+            QMessageBox.warning(self, "Latexam - 警告", "请先连接到Latexam服务器。")
+            return
+        file_path = QFileDialog.getSaveFileName(self, "Latexam - 导出成绩", "scores.csv",
+                                                "CSV 文件 (*.csv);;Excel 文件 (*.xlsx)")[0]
+        if not file_path:
+            return
+        file_format = "xlsx" if file_path.lower().endswith(".xlsx") else "csv"
+        temp_path = file_path + ".tmp"
+
+        async def download(client: httpx.AsyncClient) -> int:
+            try:
+                return await stream(client)
+            except BaseException:  # 失败或取消时删除未下载完的临时文件
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        async def stream(client: httpx.AsyncClient) -> int:
+            async with client.stream("GET", f"{self.address}/api/v1/export_scores",
+                                     params={"format": file_format}) as response:
+                if response.headers.get("content-type", "").startswith("application/json"):
+                    error = json.loads(await response.aread())
+                    raise ValueError(error.get("msg") or error.get("detail"))
+                total = int(response.headers.get("content-length") or 0)  # XLSX按字节计算进度
+                rows = int(response.headers.get("x-total-count") or 0) + 1  # CSV按行数计算进度
+                received = lines = 0
+                with open(temp_path, "wb") as file:
+                    async for chunk in response.aiter_bytes():
+                        file.write(chunk)
+                        received += len(chunk)
+                        lines += chunk.count(b"\n")
+                        self.signal.progress.emit(received * 100 // total if total else min(lines * 100 // rows, 99))
+            os.replace(temp_path, file_path)
+            return rows - 1
+
+        def finish() -> None:
+            if self.progress_dialog is None:  # 取消与完成同时发生
+                return
+            self.signal.progress.disconnect(self.progress_dialog.setValue)
+            self.progress_dialog.close()
+            self.progress_dialog = None
+
+        def done(count: int | None, error: BaseException | None) -> None:
+            finish()
+            if error is not None:
+                QMessageBox.warning(self, "Latexam - 警告", f"导出成绩失败。\n错误信息：{error}")
+                return
+            QMessageBox.information(self, "Latexam - 导出成绩", f"已导出 {count} 名考生的成绩到 {file_path}。")
+
+        self.progress_dialog = QProgressDialog("正在导出成绩……", "取消", 0, 100, self)
+        self.progress_dialog.setWindowTitle("Latexam - 导出成绩")
+        self.signal.progress.connect(self.progress_dialog.setValue)
+        future = self.request(download, done)
+        self.progress_dialog.canceled.connect(lambda: (future.cancel(), finish()))
+        self.progress_dialog.show()
+
+    def onImportStudents(self) -> None:
+        """
+        读取考生表格并批量导入服务器的考生库，读取和上传都在网络线程中进行
+        :return: 无
+        """
+        if not self.online:
+            QMessageBox.warning(self, "Latexam - 警告", "请先连接到Latexam服务器。")
+            return
+        file_path = QFileDialog.getOpenFileName(self, "选择考生表格文件", "exams/", "Excel 文件 (*.xlsx)")[0]
+        if not file_path:
+            return
+        replace = QMessageBox.question(self, "Latexam - 导入考生库", "是否删除考生库中不在该表格里的考生？",
+                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No) == QMessageBox.Yes
+        report = ImportReport()
+
+        async def upload(client: httpx.AsyncClient) -> Results:
+            students = await asyncio.to_thread(excel_to_students, Path(file_path), report)
+            content = json.dumps([student.dict() for student in students], ensure_ascii=False)
+            response = await client.post(f"{self.address}/api/v1/upload_students", content=content,
+                                         params={"replace": replace}, timeout=120)
+            return Results.parse_obj(response.json())
+
+        def done(result: Results | None, error: BaseException | None) -> None:
+            if error is not None or result.recode != 200:
+                QMessageBox.warning(self, "Latexam - 警告", f"导入考生库失败。\n错误信息：{error or result.msg}")
+                return
+            QMessageBox.information(self, "Latexam - 导入考生库", f"{result.msg}。\n{report.summary()}")
+
+        self.signal.set_output_box.emit("<p>正在导入考生库……</p>")
+        self.request(upload, done)
 
     def onPrevious(self) -> None:
         # 将当前题目的索引减1
@@ -336,6 +652,21 @@ class LatexamApplication(QMainWindow):
                                                 f"<p>点选 <font color='blue'>客观题</font> 以在第一题加入客观题；</p>"
                                                 f"<p>点选 <font color='blue'>主观题</font> 以在第一题加入主观题；</p>"
                                                 f"<p>点选 <font color='blue'>下一题</font> 以进入<strong>已有</strong>的第一题。</p>")
+        elif self.mode == "markq":
+            self.index -= 1
+            self.ui.button_send.setText("发送")
+            self.ui.button_next.setEnabled(True)
+            if self.index != -1:  # 如果不是首页
+                self.onRender()
+                self.ui.text_status.setText("阅卷打分")
+            else:
+                self.ui.text_status.setText("首页")
+                self.ui.button_previous.setEnabled(False)
+                self.ui.button_send.setEnabled(False)
+                self.ui.input_message.setEnabled(False)
+                self.signal.clear_input_box.emit()
+                self.signal.set_output_box.emit(f"<h2>{self.exam.title}</h2>"
+                                                f"<p>点选 <font color='blue'>下一题</font> 以进入本页第一份答题卡的阅卷。</p>")
         else:  # 阅卷模式
             self.index -= 1
             self.ui.button_edit.setEnabled(False)
@@ -382,6 +713,20 @@ class LatexamApplication(QMainWindow):
             self.ui.text_status.setText("编辑题干")
             self.ui.input_message.setPlainText(self.paper.questions[self.index].title)
 
+        elif self.mode == "markq":
+            self.index += 1
+            self.ui.input_message.setEnabled(True)
+            self.ui.button_previous.setEnabled(True)
+            self.ui.button_send.setEnabled(True)
+            if self.index != len(self.answer_page) - 1:  # 如果不是本页最后一份
+                self.ui.button_next.setEnabled(True)
+                self.ui.button_send.setText("发送")
+            else:
+                self.ui.button_next.setEnabled(False)
+                self.ui.button_send.setText("提交")
+            self.onRender()
+            self.ui.text_status.setText("阅卷打分")
+
         else:  # 阅卷模式
             self.index += 1
             self.ui.button_edit.setEnabled(False)
@@ -406,19 +751,14 @@ class LatexamApplication(QMainWindow):
         :return:
         """
         if self.mode == "paper":
-            if self.paper.questions[self.index].type == "objective":
-                self.signal.set_output_box.emit(f"<p>（{self.index + 1}）（本小题{self.paper.questions[self.index].score}分）</p>"
-                                                f"<p>{self.paper.questions[self.index].title}</p>")
-                for option in self.paper.questions[self.index].options:
-                    if option.correct:
-                        self.signal.append_output_box.emit(f"<p><font color='red'>{option.text}</font></p>")
-                    else:
-                        self.signal.append_output_box.emit(f"<p>{option.text}</p>")
-            else:
-                self.signal.set_output_box.emit(f"<p>（{self.index + 1}）（本小题{self.paper.questions[self.index].score}分）</p>"
-                                                f"<p>{self.paper.questions[self.index].title}</p>")
-                self.signal.append_output_box.emit(f"<p><font color='grey'>判题标准："
-                                                   f"{self.paper.questions[self.index].judgement_reference}</font></p>")
+            self.signal.set_output_box.emit(self.editor.render(self.index))
+        elif self.mode == "markq":
+            answer = self.answer_page[self.index]
+            self.signal.set_output_box.emit(f"<p>（{self.mark_question + 1}）（本小题"
+                                            f"{self.exam.paper.questions[self.mark_question].score}分）"
+                                            f"<font color='grey'>考生 {answer.uid}</font></p>"
+                                            f"<p>{answer.answer}</p>")
+            self.signal.set_input_box.emit(str(self.page_scores[answer.uid]))
         else:
             if self.exam.paper.questions[self.index].type == "objective":
                 self.ui.input_message.setEnabled(False)
@@ -434,29 +774,12 @@ class LatexamApplication(QMainWindow):
     def onSend(self) -> None:
         # 如果是修改题目
         if self.ui.button_send.text() == "发送" and self.mode == "paper":
-            if self.paper.questions[self.index].type == "objective":
-                if self.ui.text_status.text() == "编辑题干":
-                    self.paper.questions[self.index].title = self.ui.input_message.toPlainText()
-                    self.ui.text_status.setText("编辑选项1")
-                    self.option_index = 0
-                    if self.paper.questions[self.index].options[self.option_index].correct:
-                        self.ui.input_message.setPlainText(
-                            self.paper.questions[self.index].options[self.option_index].text + "~"
-                        )
-                    else:
-                        self.ui.input_message.setPlainText(
-                            self.paper.questions[self.index].options[self.option_index].text
-                        )
-                elif self.ui.text_status.text().startswith("编辑选项"):
-                    if self.option_index != len(self.paper.questions[self.index].options) - 1:
-                        option = self.ui.input_message.toPlainText()
-                        if option.endswith("~"):
-                            self.paper.questions[self.index].options[self.option_index].correct = True
-                        else:
-                            self.paper.questions[self.index].options[self.option_index].correct = False
-                        self.paper.questions[self.index].options[self.option_index].text = option.rstrip("~")
-                        self.option_index += 1
-                        self.ui.text_status.setText(f"编辑选项{self.option_index + 1}")
+            with self.editor.edit(self.index):  # 修改前后不同时记为一次可撤销的修改
+                if self.paper.questions[self.index].type == "objective":
+                    if self.ui.text_status.text() == "编辑题干":
+                        self.paper.questions[self.index].title = self.ui.input_message.toPlainText()
+                        self.ui.text_status.setText("编辑选项1")
+                        self.option_index = 0
                         if self.paper.questions[self.index].options[self.option_index].correct:
                             self.ui.input_message.setPlainText(
                                 self.paper.questions[self.index].options[self.option_index].text + "~"
@@ -465,31 +788,49 @@ class LatexamApplication(QMainWindow):
                             self.ui.input_message.setPlainText(
                                 self.paper.questions[self.index].options[self.option_index].text
                             )
-                    else:
-                        option = self.ui.input_message.toPlainText()
-                        if option.endswith("~"):
-                            self.paper.questions[self.index].options[self.option_index].correct = True
+                    elif self.ui.text_status.text().startswith("编辑选项"):
+                        if self.option_index != len(self.paper.questions[self.index].options) - 1:
+                            option = self.ui.input_message.toPlainText()
+                            if option.endswith("~"):
+                                self.paper.questions[self.index].options[self.option_index].correct = True
+                            else:
+                                self.paper.questions[self.index].options[self.option_index].correct = False
+                            self.paper.questions[self.index].options[self.option_index].text = option.rstrip("~")
+                            self.option_index += 1
+                            self.ui.text_status.setText(f"编辑选项{self.option_index + 1}")
+                            if self.paper.questions[self.index].options[self.option_index].correct:
+                                self.ui.input_message.setPlainText(
+                                    self.paper.questions[self.index].options[self.option_index].text + "~"
+                                )
+                            else:
+                                self.ui.input_message.setPlainText(
+                                    self.paper.questions[self.index].options[self.option_index].text
+                                )
                         else:
-                            self.paper.questions[self.index].options[self.option_index].correct = False
-                        self.paper.questions[self.index].options[self.option_index].text = option.rstrip("~")
+                            option = self.ui.input_message.toPlainText()
+                            if option.endswith("~"):
+                                self.paper.questions[self.index].options[self.option_index].correct = True
+                            else:
+                                self.paper.questions[self.index].options[self.option_index].correct = False
+                            self.paper.questions[self.index].options[self.option_index].text = option.rstrip("~")
+                            self.ui.text_status.setText("编辑题干")
+                            self.ui.input_message.setPlainText(self.paper.questions[self.index].title)
+                else:
+                    if self.ui.text_status.text() == "编辑题干":
+                        self.paper.questions[self.index].title = self.ui.input_message.toPlainText()
+                        self.ui.text_status.setText("编辑判题标准")
+                        self.ui.input_message.setPlainText(self.paper.questions[self.index].judgement_reference)
+                    else:
+                        self.paper.questions[self.index].judgement_reference = self.ui.input_message.toPlainText()
                         self.ui.text_status.setText("编辑题干")
                         self.ui.input_message.setPlainText(self.paper.questions[self.index].title)
-            else:
-                if self.ui.text_status.text() == "编辑题干":
-                    self.paper.questions[self.index].title = self.ui.input_message.toPlainText()
-                    self.ui.text_status.setText("编辑判题标准")
-                    self.ui.input_message.setPlainText(self.paper.questions[self.index].judgement_reference)
-                else:
-                    self.paper.questions[self.index].judgement_reference = self.ui.input_message.toPlainText()
-                    self.ui.text_status.setText("编辑题干")
-                    self.ui.input_message.setPlainText(self.paper.questions[self.index].title)
             self.onRender()
 
         # 如果是删除题目
         elif self.ui.button_send.text() == "删除" and self.mode == "paper":
             dialog = QMessageBox.warning(self, "警告", "确定要删除此题吗？", QMessageBox.Yes | QMessageBox.No)
             if dialog == QMessageBox.Yes:
-                self.paper.questions.pop(self.index)
+                self.editor.delete(self.index)
                 self.onPrevious()
 
         elif self.mode == "mark":
@@ -499,13 +840,42 @@ class LatexamApplication(QMainWindow):
             else:
                 QMessageBox.warning(self, "错误", "请对打分的题目输入一个整数！")
             if self.index == len(self.score_list) - 1:  # 如果已经打完最后一题
-                request = self.client.post(f"{self.address}/api/v1/upload_score",
-                                            content=ScoreData(uid=self.sheet.student.uid,
-                                                          score=sum(self.score_list)).json())
-                if request.status_code == 200:
-                    QMessageBox.information(self, "成功", f"考生 {self.sheet.student.uid} 的分数上传成功！")
+                data = ScoreData(uid=self.sheet.student.uid, score=sum(self.score_list))
+
+                async def upload(client: httpx.AsyncClient) -> httpx.Response:
+                    return await client.post(f"{self.address}/api/v1/upload_score", content=data.json())
+
+                def done(request: httpx.Response | None, error: BaseException | None) -> None:
+                    if error is None and request.status_code == 200:
+                        QMessageBox.information(self, "成功", f"考生 {data.uid} 的分数上传成功！")
+                    else:
+                        QMessageBox.warning(self, "失败", f"分数上传失败，服务器返回了错误："
+                                                        f"{error or request.json()['msg']}")
+
+                self.request(upload, done)
+
+        elif self.mode == "markq":
+            score: str = self.ui.input_message.toPlainText()
+            if not score.isdigit():
+                QMessageBox.warning(self, "错误", "请对打分的题目输入一个整数！")
+                return
+            self.page_scores[self.answer_page[self.index].uid] = int(score)
+            if self.index != len(self.answer_page) - 1:
+                self.onNext()
+                return
+            # 已经打完本页最后一份，整页上传后进入预取好的下一页
+            data = QuestionScoreData(index=self.mark_question, scores=self.page_scores)
+
+            async def upload(client: httpx.AsyncClient) -> httpx.Response:
+                return await client.post(f"{self.address}/api/v1/upload_question_scores", content=data.json())
+
+            def done(request: httpx.Response | None, error: BaseException | None) -> None:
+                if error is None and request.status_code == 200 and request.json()["recode"] == 200:
+                    self.loadAnswerPage()
                 else:
-                    QMessageBox.warning(self, "失败", f"分数上传失败，服务器返回了错误：{request.json()['msg']}")
+                    QMessageBox.warning(self, "失败", f"分数上传失败，服务器返回了错误：{error or request.json()['msg']}")
+
+            self.request(upload, done)
 
     def onEdit(self) -> None:
         if self.mode == "paper":
@@ -515,33 +885,185 @@ class LatexamApplication(QMainWindow):
             else:
                 # 先修改本题分数
                 score = QInputDialog.getInt(self, "修改分数", "请输入本题分数", self.paper.questions[self.index].score, 0, 2147483647, 1)
-                self.paper.questions[self.index].score = score[0]
+                with self.editor.edit(self.index) as question:
+                    question.score = score[0]
                 self.onRender()
                 self.ui.button_send.setText("发送")
         else:  # 编辑考试模式
+            if self.exam_cache is not None:  # 服务器上已有考试时，可以只发送修改的部分
+                choice, ok = QInputDialog.getItem(self, "Latexam - 编辑考试", "请选择修改方式",
+                                                  ["修改考试信息", "更新考生名单", "重新设定考试"], 0, False)
+                if not ok:
+                    self.mode = ""
+                    return
+                if choice == "修改考试信息":
+                    self.patchExamInfo()
+                    return
+                if choice == "更新考生名单":
+                    self.patchRoster()
+                    return
             file_path = QFileDialog.getOpenFileName(self, "选择考试文件", "exams/", "Latexam 考试文件 (*.lep)")[0]
             if not file_path:
                 self.mode = ""
                 return
-            with open(file_path, "r", encoding="utf-8") as file:
-                self.exam.paper = Paper.parse_raw(file.read())
+            self.exam.paper = load_paper(file_path)
+            assets_path = os.path.join(os.path.dirname(file_path), "assets")  # 试卷文件夹中的资源文件
             file_path = QFileDialog.getOpenFileName(self, "选择考试考生表格文件", "exams/", "Excel 文件 (*.xlsx)")[0]
             if not file_path:
                 self.mode = ""
                 return
-            self.exam.student_list = excel_to_students(Path(file_path))
+            report = ImportReport()
+            try:
+                self.exam.student_list = excel_to_students(Path(file_path), report)
+            except ValueError as error:
+                QMessageBox.critical(self, "Latexam - 错误", f"无法读取考生表格：{error}")
+                self.mode = ""
+                return
+            if not report.ok:
+                QMessageBox.warning(self, "Latexam - 导入考生", report.summary())
             self.exam.title = QInputDialog.getText(self, "Latexam - 编辑考试", "请输入考试标题")[0]
             self.exam.start_time = datetime.fromtimestamp(QInputDialog.getInt(self, "Latexam - 编辑考试", "请输入考试开始的时间戳",
                                                                               value=int(time.time()))[0])
             self.exam.end_time = datetime.fromtimestamp(QInputDialog.getInt(self, "Latexam - 编辑考试", "请输入考试结束的时间戳",
                                                                             value=int(time.time()))[0])
 
-            request = self.client.post(f"{self.address}/api/v1/set_exam", content=self.exam.json())
-            if request.status_code == 200:
-                QMessageBox.information(self, "成功", "考试上传成功！")
+            exam = self.exam.copy(deep=True)
+
+            async def upload(client: httpx.AsyncClient) -> httpx.Response:
+                links = await self.uploadAssets(client, assets_path)
+                return await client.post(f"{self.address}/api/v1/set_exam", content=self.linkAssets(exam, links).json())
+
+            def done(request: httpx.Response | None, error: BaseException | None) -> None:
+                if error is None and request.status_code == 200:
+                    QMessageBox.information(self, "成功", "考试上传成功！")
+                    self.onEditExam()
+                else:
+                    QMessageBox.warning(self, "失败", f"考试上传失败，服务器返回了错误：{error or request.json()['detail']}")
+
+            self.request(upload, done)
+
+    def patchExamInfo(self) -> None:
+        """
+        只修改考试标题和起止时间，发送有变化的字段
+        :return: 无
+        """
+        title = QInputDialog.getText(self, "Latexam - 修改考试信息", "请输入考试标题", text=self.exam.title)[0]
+        start_time = datetime.fromtimestamp(QInputDialog.getInt(self, "Latexam - 修改考试信息", "请输入考试开始的时间戳",
+                                                                value=int(self.exam.start_time.timestamp()))[0],
+                                            tz=timezone.utc)
+        end_time = datetime.fromtimestamp(QInputDialog.getInt(self, "Latexam - 修改考试信息", "请输入考试结束的时间戳",
+                                                              value=int(self.exam.end_time.timestamp()))[0],
+                                          tz=timezone.utc)
+        data = ExamPatchData(version=self.exam.version,
+                             title=title if title and title != self.exam.title else None,
+                             start_time=start_time if start_time != self.exam.start_time else None,
+                             end_time=end_time if end_time != self.exam.end_time else None)
+        self.sendPatch("/exam", data)
+
+    def patchRoster(self) -> None:
+        """
+        读取新的考生表格，与服务器上的名单比较后只发送增删的考生
+        :return: 无
+        """
+        file_path = QFileDialog.getOpenFileName(self, "选择考试考生表格文件", "exams/", "Excel 文件 (*.xlsx)")[0]
+        if not file_path:
+            return
+        report = ImportReport()
+        current = {student.uid: student for student in self.exam.student_list}
+        version = self.exam.version
+
+        def diff(students: list[Student]) -> RosterPatchData:
+            incoming = {student.uid for student in students}
+            return RosterPatchData(version=version,
+                                   add=[student for student in students if student.uid not in current
+                                        or current[student.uid].nickname != student.nickname
+                                        or current[student.uid].password != student.password],
+                                   remove=[uid for uid in current if uid not in incoming])
+
+        async def upload(client: httpx.AsyncClient) -> Results | None:
+            students = await asyncio.to_thread(excel_to_students, Path(file_path), report)
+            data = await asyncio.to_thread(diff, students)
+            if not data.add and not data.remove:
+                return None
+            response = await client.patch(f"{self.address}/api/v1/exam/roster", content=data.json(), timeout=120)
+            return Results.parse_obj(response.json())
+
+        def done(result: Results | None, error: BaseException | None) -> None:
+            if error is not None:
+                QMessageBox.warning(self, "失败", f"更新考生名单失败：{error}")
+            elif result is None:
+                QMessageBox.information(self, "Latexam - 更新考生名单", f"考生名单没有变化。\n{report.summary()}")
+            elif result.recode != 200:
+                QMessageBox.warning(self, "失败", f"更新考生名单失败：{result.msg}")
+            else:
+                QMessageBox.information(self, "成功", f"{result.msg}\n{report.summary()}")
+                self.onEditExam()
+
+        self.signal.set_output_box.emit("<p>正在读取考生表格……</p>")
+        self.request(upload, done)
+
+    def sendPatch(self, path: str, data: BaseData) -> None:
+        """
+        发送考试的增量修改，完成后重新获取考试信息
+        :param path: 接口路径
+        :param data: 修改内容
+        :return: 无
+        """
+        async def upload(client: httpx.AsyncClient) -> Results:
+            return Results.parse_obj((await client.patch(f"{self.address}/api/v1{path}", content=data.json())).json())
+
+        def done(result: Results | None, error: BaseException | None) -> None:
+            if error is None and result.recode == 200:
+                QMessageBox.information(self, "成功", result.msg)
                 self.onEditExam()
             else:
-                QMessageBox.warning(self, "失败", f"考试上传失败，服务器返回了错误：{request.json()['detail']}")
+                QMessageBox.warning(self, "失败", f"修改考试失败：{error or result.msg}")
+
+        self.request(upload, done)
+
+    async def uploadAssets(self, client: httpx.AsyncClient, directory: str) -> dict[str, str]:
+        """
+        上传试卷文件夹中的资源文件，服务器已有的（按内容哈希判断）不再上传，在网络线程中执行
+        :param client: 网络线程的客户端
+        :param directory: 资源文件夹
+        :return: 试卷中的相对路径（assets/<文件名>）到资源引用（asset:<sha256>）的映射
+        """
+        links = {}
+        if not os.path.isdir(directory):
+            return links
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, "rb") as file:
+                content = file.read()
+            digest = hashlib.sha256(content).hexdigest()
+            if (await client.head(f"{self.address}/api/v1/assets/{digest}")).status_code != 200:
+                response = await client.post(f"{self.address}/api/v1/upload_asset", content=content,
+                                             params={"suffix": os.path.splitext(name)[1]})
+                if response.json()["recode"] != 200:
+                    raise ValueError(f"资源文件 {name} 上传失败：{response.json()['msg']}")
+            links[f"assets/{name}"] = f"asset:{digest}"
+        return links
+
+    @staticmethod
+    def linkAssets(exam: Exam, links: dict[str, str]) -> Exam:
+        """
+        将试卷中对资源文件相对路径的引用替换为按内容哈希的引用
+        :param exam: 考试
+        :param links: uploadAssets返回的映射
+        :return: 替换后的考试（即exam本身）
+        """
+        def link(text: str) -> str:
+            # 只替换完整的src引用，assets/a.png不会误改assets/aa.png
+            return SRC_PATTERN.sub(lambda match: f"{match[1]}{match[2]}{links.get(match[3], match[3])}{match[2]}", text)
+
+        for question in exam.paper.questions:
+            question.title = link(question.title)
+            question.judgement_reference = link(question.judgement_reference)
+            for option in question.options:
+                option.text = link(option.text)
+        return exam
 
     def onObjective(self) -> None:
         self.ui.button_previous.setEnabled(True)
@@ -558,7 +1080,7 @@ class LatexamApplication(QMainWindow):
             ],
             judgement_reference=""
         )
-        self.paper.questions.insert(self.index + 1, template)
+        self.editor.insert(self.index + 1, template)
         self.onNext()
 
     def onSubjective(self) -> None:
@@ -570,7 +1092,7 @@ class LatexamApplication(QMainWindow):
             options=[],
             judgement_reference="这是一道主观题，请根据判题标准进行打分。"
         )
-        self.paper.questions.insert(self.index + 1, template)
+        self.editor.insert(self.index + 1, template)
         self.onNext()
 
     def onStatusClicked(self, item: QTreeWidgetItem) -> None:
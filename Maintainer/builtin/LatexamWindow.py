@@ -639,8 +639,18 @@ class Ui_LatexamWindow(object):
         self.action_savepaper.setObjectName(u"action_savepaper")
         self.action_judgement = QAction(LatexamWindow)
         self.action_judgement.setObjectName(u"action_judgement")
+        self.action_markquestion = QAction(LatexamWindow)
+        self.action_markquestion.setObjectName(u"action_markquestion")
         self.action_getscore = QAction(LatexamWindow)
         self.action_getscore.setObjectName(u"action_getscore")
+        self.action_exportscores = QAction(LatexamWindow)
+        self.action_exportscores.setObjectName(u"action_exportscores")
+        self.action_importstudents = QAction(LatexamWindow)
+        self.action_importstudents.setObjectName(u"action_importstudents")
+        self.action_undo = QAction(LatexamWindow)
+        self.action_undo.setObjectName(u"action_undo")
+        self.action_redo = QAction(LatexamWindow)
+        self.action_redo.setObjectName(u"action_redo")
         self.centralwidget = QWidget(LatexamWindow)
         self.centralwidget.setObjectName(u"centralwidget")
         self.horizontalLayout_3 = QHBoxLayout(self.centralwidget)
@@ -810,7 +820,13 @@ class Ui_LatexamWindow(object):
         self.menu_edit.addAction(self.action_savepaper)
         self.menu_edit.addAction(self.action_fileexam)
         self.menu_edit.addAction(self.action_judgement)
+        self.menu_edit.addAction(self.action_markquestion)
         self.menu_edit.addAction(self.action_getscore)
+        self.menu_edit.addAction(self.action_exportscores)
+        self.menu_edit.addAction(self.action_importstudents)
+        self.menu_edit.addSeparator()
+        self.menu_edit.addAction(self.action_undo)
+        self.menu_edit.addAction(self.action_redo)
 
         self.retranslateUi(LatexamWindow)
         self.menubar.triggered.connect(LatexamWindow.triggeredMenubar)
@@ -838,7 +854,18 @@ class Ui_LatexamWindow(object):
         self.action_fileexam.setText(QCoreApplication.translate("LatexamWindow", u"\u65b0\u5efa/\u7f16\u8f91\u8003\u8bd5", None))
         self.action_savepaper.setText(QCoreApplication.translate("LatexamWindow", u"\u4fdd\u5b58\u8bd5\u5377", None))
         self.action_judgement.setText(QCoreApplication.translate("LatexamWindow", u"\u6279\u6539\u8003\u8bd5\u8bd5\u5377", None))
+        self.action_markquestion.setText(QCoreApplication.translate("LatexamWindow", u"\u6309\u9898\u6279\u6539\u8bd5\u5377", None))
         self.action_getscore.setText(QCoreApplication.translate("LatexamWindow", u"\u67e5\u8be2\u5206\u6570", None))
+        self.action_exportscores.setText(QCoreApplication.translate("LatexamWindow", u"\u5bfc\u51fa\u6210\u7ee9", None))
+        self.action_importstudents.setText(QCoreApplication.translate("LatexamWindow", u"\u5bfc\u5165\u8003\u751f\u5e93", None))
+        self.action_undo.setText(QCoreApplication.translate("LatexamWindow", u"\u64a4\u9500", None))
+#if QT_CONFIG(shortcut)
+        self.action_undo.setShortcut(QCoreApplication.translate("LatexamWindow", u"Ctrl+Z", None))
+#endif // QT_CONFIG(shortcut)
+        self.action_redo.setText(QCoreApplication.translate("LatexamWindow", u"\u91cd\u505a", None))
+#if QT_CONFIG(shortcut)
+        self.action_redo.setShortcut(QCoreApplication.translate("LatexamWindow", u"Ctrl+Y", None))
+#endif // QT_CONFIG(shortcut)
 
         __sortingEnabled = self.output_status.isSortingEnabled()
         self.output_status.setSortingEnabled(False)
@@ -0,0 +1,189 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+
+from Core.models import Paper, Question
+from Core.Tools import PaperReader, encode_question, pack_paper, write_atomic, CODEC
+
+AUTOSAVE_INTERVAL = 5  # 自动保存的检查间隔，单位秒
+HISTORY_SIZE = 200  # 最多可撤销的修改次数
+
+
+class Change(NamedTuple):
+    """
+    一次题目级修改，before为None表示插入，after为None表示删除
+    """
+    index: int
+    before: Question | None
+    after: Question | None
+
+
+class PaperEditor:
+    """
+    管理端试卷编辑模型
+
+    各题压缩后的数据段（见Core.Tools.paperfile）与题目一一对应，修改过的题目数据段置为None（脏），
+    保存时只重新压缩脏题目，其余直接复用，因此保存耗时与修改的题目数而不是试卷大小有关。
+    后台线程定期把有修改的试卷原子地写回paper.lep；每次修改记录修改前后的题目，可以撤销和重做。
+    界面线程的修改与保存线程的读取由同一把锁保护。
+    """
+    def __init__(self, path: str, history: int = HISTORY_SIZE, interval: float = AUTOSAVE_INTERVAL):
+        self.path: str = path
+        self.interval: float = interval
+        with PaperReader(path) as reader:
+            questions = [reader.question(index) for index in range(len(reader))]
+            # 压缩方式与当前写入的相同时，已有的数据段可以直接复用
+            self.sections: list[bytes | None] = [reader.section(index) if reader.codec == CODEC else None
+                                                 for index in range(len(reader))]
+            self.paper: Paper = Paper.construct(serial_number=reader.serial_number, title=reader.title,
+                                                questions=questions)
+        self.rendered: list[str | None] = [None] * len(questions)  # 各题渲染好的HTML
+        self.undo_stack: deque[Change] = deque(maxlen=history)
+        self.redo_stack: list[Change] = []
+        self.version: int = 0  # 每次修改加1
+        self.saved_version: int = 0  # 已写入文件的版本
+        self.lock = threading.RLock()
+        self.save_lock = threading.Lock()  # 手动保存与自动保存不同时写文件
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._autosave, name="LatexamAutosave", daemon=True)
+        self.thread.start()
+
+    @property
+    def modified(self) -> bool:
+        return self.version != self.saved_version
+
+    def _touch(self, index: int) -> None:
+        self.sections[index] = None
+        self.rendered[index] = None
+        self.version += 1
+
+    @contextmanager
+    def edit(self, index: int) -> Iterator[Question]:
+        """
+        原地修改一道题目，内容确有变化时标记为脏并记入撤销记录
+        :param index: 题号（从0开始）
+        :return: 可直接修改的题目
+        """
+        with self.lock:
+            question = self.paper.questions[index]
+            before = question.copy(deep=True)
+            yield question
+            if question != before:
+                self._record(Change(index, before, question.copy(deep=True)))
+                self._touch(index)
+
+    def insert(self, index: int, question: Question) -> None:
+        with self.lock:
+            self._insert(index, question)
+            self._record(Change(index, None, question.copy(deep=True)))
+
+    def delete(self, index: int) -> None:
+        with self.lock:
+            self._record(Change(index, self.paper.questions[index].copy(deep=True), None))
+            self._delete(index)
+
+    def _insert(self, index: int, question: Question) -> None:
+        self.paper.questions.insert(index, question)
+        self.sections.insert(index, None)
+        self.rendered.insert(index, None)
+        self.version += 1
+
+    def _delete(self, index: int) -> None:
+        self.paper.questions.pop(index)
+        self.sections.pop(index)
+        self.rendered.pop(index)
+        self.version += 1
+
+    def _record(self, change: Change) -> None:
+        self.undo_stack.append(change)
+        self.redo_stack.clear()
+
+    def _apply(self, index: int, old: Question | None, new: Question | None) -> None:
+        if old is None:
+            self._insert(index, new.copy(deep=True))
+        elif new is None:
+            self._delete(index)
+        else:
+            self.paper.questions[index] = new.copy(deep=True)
+            self._touch(index)
+
+    def undo(self) -> int | None:
+        """
+        撤销最近一次修改
+        :return: 受影响的题号，没有可撤销的修改时返回None
+        """
+        with self.lock:
+            if not self.undo_stack:
+                return None
+            change = self.undo_stack.pop()
+            self._apply(change.index, change.after, change.before)
+            self.redo_stack.append(change)
+            return change.index
+
+    def redo(self) -> int | None:
+        """
+        重做最近一次撤销的修改
+        :return: 受影响的题号，没有可重做的修改时返回None
+        """
+        with self.lock:
+            if not self.redo_stack:
+                return None
+            change = self.redo_stack.pop()
+            self._apply(change.index, change.before, change.after)
+            self.undo_stack.append(change)
+            return change.index
+
+    def render(self, index: int) -> str:
+        """
+        渲染一道题目，未修改的题目直接使用上次的结果（题号随插入删除变化，不计入缓存）
+        :param index: 题号（从0开始）
+        :return: HTML
+        """
+        with self.lock:
+            if (html := self.rendered[index]) is not None:
+                return f"<p>（{index + 1}）{html}"
+            question = self.paper.questions[index]
+            html = f"（本小题{question.score}分）</p><p>{question.title}</p>"
+            if question.type == "objective":
+                html += "".join(f"<p><font color='red'>{option.text}</font></p>" if option.correct
+                                else f"<p>{option.text}</p>" for option in question.options)
+            else:
+                html += f"<p><font color='grey'>判题标准：{question.judgement_reference}</font></p>"
+            self.rendered[index] = html
+            return f"<p>（{index + 1}）{html}"
+
+    def save(self) -> bool:
+        """
+        只压缩脏题目，组装后原子地写回文件
+        :return: 有修改并已写入时返回True
+        """
+        with self.save_lock:
+            with self.lock:
+                if not self.modified:
+                    return False
+                for index, section in enumerate(self.sections):
+                    if section is None:
+                        self.sections[index] = encode_question(self.paper.questions[index])
+                data = pack_paper(self.paper.serial_number, self.paper.title, list(self.sections))
+                version = self.version
+            # 写文件期间不持有lock，界面线程可以继续修改；写入期间的修改由下一次保存写入
+            write_atomic(self.path, data)
+            self.saved_version = version
+            return True
+
+    def _autosave(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.save()
+            except OSError:
+                pass  # 文件暂时无法写入时等下一次再试
+
+    def close(self) -> None:
+        """
+        停止自动保存并写入尚未保存的修改
+        :return: 无
+        """
+        self.stopped.set()
+        self.thread.join()
+        self.save()
@@ -0,0 +1,3 @@
+CREATE INDEX IF NOT EXISTS "Uid" ON "Student" (
+	"Uid"
+);
\ No newline at end of file
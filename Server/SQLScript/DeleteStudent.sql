@@ -0,0 +1 @@
+DELETE FROM Student WHERE Uid=:uid;
\ No newline at end of file
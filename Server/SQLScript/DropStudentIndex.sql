@@ -0,0 +1 @@
+DROP INDEX IF EXISTS "Uid";
\ No newline at end of file
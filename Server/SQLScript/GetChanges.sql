@@ -0,0 +1 @@
+SELECT Seq, Origin, Kind, ExamId, Uid, Data FROM Change WHERE Seq > :seq ORDER BY Seq;
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT Uid, Question, Answer FROM Draft WHERE ExamId=:exam_id;
\ No newline at end of file
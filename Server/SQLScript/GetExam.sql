@@ -0,0 +1 @@
+SELECT Data FROM Exam WHERE Uuid=:uuid;
\ No newline at end of file
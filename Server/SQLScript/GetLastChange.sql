@@ -0,0 +1 @@
+SELECT COALESCE(MAX(Seq), 0) FROM Change;
\ No newline at end of file
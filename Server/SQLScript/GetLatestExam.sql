@@ -0,0 +1 @@
+SELECT Data FROM Exam ORDER BY UpdateTime DESC LIMIT 1;
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT Uid, Question, Score FROM Mark WHERE ExamId=:exam_id;
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT Uid, Score, Marked FROM Score WHERE ExamId=:exam_id ORDER BY rowid;
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT Data FROM Sheet WHERE Uid=:uid AND ExamId=:exam_id;
\ No newline at end of file
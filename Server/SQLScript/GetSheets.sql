@@ -0,0 +1 @@
+SELECT Data FROM Sheet WHERE ExamId=:exam_id ORDER BY rowid;
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT Uid, Nickname, Password FROM Student;
\ No newline at end of file
@@ -0,0 +1,62 @@
+PRAGMA journal_mode=WAL;
+
+PRAGMA synchronous=FULL;
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS "Exam" (
+	"Uuid"	TEXT NOT NULL UNIQUE,
+	"Data"	TEXT NOT NULL,
+	"UpdateTime"	REAL NOT NULL,
+	PRIMARY KEY("Uuid")
+);
+
+CREATE TABLE IF NOT EXISTS "Sheet" (
+	"Uid"	TEXT NOT NULL,
+	"ExamId"	TEXT NOT NULL,
+	"Data"	TEXT NOT NULL,
+	PRIMARY KEY("Uid", "ExamId")
+);
+
+CREATE TABLE IF NOT EXISTS "Score" (
+	"Uid"	TEXT NOT NULL,
+	"ExamId"	TEXT NOT NULL,
+	"Score"	INTEGER NOT NULL,
+	"Marked"	INTEGER NOT NULL,
+	PRIMARY KEY("Uid", "ExamId")
+);
+
+CREATE TABLE IF NOT EXISTS "Mark" (
+	"Uid"	TEXT NOT NULL,
+	"ExamId"	TEXT NOT NULL,
+	"Question"	INTEGER NOT NULL,
+	"Score"	INTEGER NOT NULL,
+	PRIMARY KEY("Uid", "ExamId", "Question")
+);
+
+CREATE TABLE IF NOT EXISTS "Draft" (
+	"Uid"	TEXT NOT NULL,
+	"ExamId"	TEXT NOT NULL,
+	"Question"	INTEGER NOT NULL,
+	"Answer"	TEXT NOT NULL,
+	PRIMARY KEY("Uid", "ExamId", "Question")
+);
+
+CREATE TABLE IF NOT EXISTS "Change" (
+	"Seq"	INTEGER NOT NULL,
+	"Origin"	INTEGER NOT NULL,
+	"Kind"	TEXT NOT NULL,
+	"ExamId"	TEXT NOT NULL,
+	"Uid"	TEXT NOT NULL,
+	"Data"	TEXT NOT NULL,
+	PRIMARY KEY("Seq" AUTOINCREMENT)
+);
+
+CREATE TABLE IF NOT EXISTS "Worker" (
+	"Origin"	INTEGER NOT NULL,
+	"Seq"	INTEGER NOT NULL,
+	"UpdateTime"	REAL NOT NULL,
+	PRIMARY KEY("Origin")
+);
+
+COMMIT;
@@ -0,0 +1 @@
+INSERT INTO Change (Origin, Kind, ExamId, Uid, Data) VALUES (:origin, :kind, :exam_id, :uid, :data);
\ No newline at end of file
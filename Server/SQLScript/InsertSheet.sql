@@ -0,0 +1 @@
+INSERT OR IGNORE INTO Sheet (Uid, ExamId, Data) VALUES (:uid, :exam_id, :data);
\ No newline at end of file
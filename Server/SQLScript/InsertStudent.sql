@@ -0,0 +1 @@
+INSERT INTO Student (Uid, Nickname, Password) VALUES (:uid, :nickname, :password);
\ No newline at end of file
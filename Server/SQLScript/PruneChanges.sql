@@ -0,0 +1 @@
+DELETE FROM Change WHERE Seq <= (SELECT MIN(Seq) FROM Worker WHERE UpdateTime >= :since);
\ No newline at end of file
@@ -0,0 +1,2 @@
+INSERT INTO Exam (Uuid, Data, UpdateTime) VALUES (:uuid, :data, :time)
+ON CONFLICT (Uuid) DO UPDATE SET Data=excluded.Data, UpdateTime=excluded.UpdateTime;
\ No newline at end of file
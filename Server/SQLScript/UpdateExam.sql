@@ -0,0 +1,2 @@
+UPDATE Exam SET Data=:data, UpdateTime=:time
+WHERE Uuid=:uuid AND COALESCE(json_extract(Data, '$.version'), 0)=:version;
\ No newline at end of file
@@ -0,0 +1 @@
+UPDATE Student SET Nickname=:nickname, Password=:password WHERE Uid=:uid;
\ No newline at end of file
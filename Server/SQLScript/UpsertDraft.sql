@@ -0,0 +1,2 @@
+INSERT INTO Draft (Uid, ExamId, Question, Answer) VALUES (:uid, :exam_id, :question, :answer)
+ON CONFLICT (Uid, ExamId, Question) DO UPDATE SET Answer=excluded.Answer;
\ No newline at end of file
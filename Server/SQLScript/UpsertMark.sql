@@ -0,0 +1,2 @@
+INSERT INTO Mark (Uid, ExamId, Question, Score) VALUES (:uid, :exam_id, :question, :score)
+ON CONFLICT (Uid, ExamId, Question) DO UPDATE SET Score=excluded.Score;
\ No newline at end of file
@@ -0,0 +1,2 @@
+INSERT INTO Score (Uid, ExamId, Score, Marked) VALUES (:uid, :exam_id, :score, :marked)
+ON CONFLICT (Uid, ExamId) DO UPDATE SET Score=excluded.Score, Marked=excluded.Marked;
\ No newline at end of file
@@ -0,0 +1,2 @@
+INSERT INTO Worker (Origin, Seq, UpdateTime) VALUES (:origin, :seq, :time)
+ON CONFLICT (Origin) DO UPDATE SET Seq=excluded.Seq, UpdateTime=excluded.UpdateTime;
\ No newline at end of file
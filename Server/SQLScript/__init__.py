@@ -4,8 +4,32 @@ root = Path(__file__).parent
 
 class SQLScript:
     InitStudentDatabase: str = (root / "InitStudentDatabase.sql").read_text(encoding="utf-8")
+    InitJournal: str = (root / "InitJournal.sql").read_text(encoding="utf-8")
 
 
 class SQLCommand:
     GetStudentInfo: str = (root / "./GetStudentInfo.sql").read_text(encoding="utf-8")
-
+    SaveExam: str = (root / "./SaveExam.sql").read_text(encoding="utf-8")
+    UpdateExam: str = (root / "./UpdateExam.sql").read_text(encoding="utf-8")
+    GetLatestExam: str = (root / "./GetLatestExam.sql").read_text(encoding="utf-8")
+    GetExam: str = (root / "./GetExam.sql").read_text(encoding="utf-8")
+    InsertSheet: str = (root / "./InsertSheet.sql").read_text(encoding="utf-8")
+    UpsertScore: str = (root / "./UpsertScore.sql").read_text(encoding="utf-8")
+    GetSheets: str = (root / "./GetSheets.sql").read_text(encoding="utf-8")
+    GetSheet: str = (root / "./GetSheet.sql").read_text(encoding="utf-8")
+    GetScores: str = (root / "./GetScores.sql").read_text(encoding="utf-8")
+    UpsertMark: str = (root / "./UpsertMark.sql").read_text(encoding="utf-8")
+    GetMarks: str = (root / "./GetMarks.sql").read_text(encoding="utf-8")
+    InsertChange: str = (root / "./InsertChange.sql").read_text(encoding="utf-8")
+    GetChanges: str = (root / "./GetChanges.sql").read_text(encoding="utf-8")
+    GetLastChange: str = (root / "./GetLastChange.sql").read_text(encoding="utf-8")
+    UpsertWorker: str = (root / "./UpsertWorker.sql").read_text(encoding="utf-8")
+    PruneChanges: str = (root / "./PruneChanges.sql").read_text(encoding="utf-8")
+    UpsertDraft: str = (root / "./UpsertDraft.sql").read_text(encoding="utf-8")
+    GetDrafts: str = (root / "./GetDrafts.sql").read_text(encoding="utf-8")
+    GetStudents: str = (root / "./GetStudents.sql").read_text(encoding="utf-8")
+    InsertStudent: str = (root / "./InsertStudent.sql").read_text(encoding="utf-8")
+    UpdateStudent: str = (root / "./UpdateStudent.sql").read_text(encoding="utf-8")
+    DeleteStudent: str = (root / "./DeleteStudent.sql").read_text(encoding="utf-8")
+    DropStudentIndex: str = (root / "./DropStudentIndex.sql").read_text(encoding="utf-8")
+    CreateStudentIndex: str = (root / "./CreateStudentIndex.sql").read_text(encoding="utf-8")
\ No newline at end of file
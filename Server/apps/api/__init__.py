@@ -1,8 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
 from .login import login_api
 from .exam import exam_api
+from .asset import asset_api
 
-api = APIRouter(prefix="/api/v1")
+from Server.tools.verify import sync_shared_state
+
+api = APIRouter(prefix="/api/v1", dependencies=[Depends(sync_shared_state)])
 api.include_router(login_api)
-api.include_router(exam_api)
\ No newline at end of file
+api.include_router(exam_api)
+api.include_router(asset_api)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import Response
+
+from Core.models import *
+from Server.core.AssetStore import AssetResponse
+from Server.tools.verify import verify_admin
+from Server.main import server
+
+asset_api = APIRouter(prefix="")
+
+
+@asset_api.api_route("/assets/{digest}", methods=["GET", "HEAD"])
+async def _(digest: str, range: str | None = Header(None), if_none_match: str | None = Header(None)):
+    """
+    按sha256获取试卷资源文件，内容不会改变，客户端可以永久缓存
+    """
+    if (path := server.assets.get(digest)) is None:
+        return Response(status_code=404)
+    if if_none_match is not None and f'"{digest}"' in if_none_match:
+        return Response(status_code=304, headers={"ETag": f'"{digest}"'})
+    return AssetResponse(path, digest, range)
+
+
+@asset_api.post("/upload_asset")
+async def _(request: Request, suffix: str = "", token = Depends(verify_admin)):
+    """
+    上传一个试卷资源文件，请求体为文件内容，suffix为扩展名（如.png）
+    """
+    if suffix and (not suffix.startswith(".") or "/" in suffix or "\\" in suffix):
+        return Results(recode=401, msg="扩展名格式错误")
+    digest = await asyncio.to_thread(server.assets.put, await request.body(), suffix)
+    return Results(msg="上传成功", data=digest)
@@ -1,7 +1,13 @@
+import asyncio
+import tempfile
+from time import perf_counter
+
 from fastapi import APIRouter
-from fastapi import Depends
+from fastapi import Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
 from Core.models import *
+from Server.core.ScoreExport import ScoreExport, EXPORT_FORMATS
 from Server.tools.verify import verify_student, verify_exam_status, verify_admin
 from Server.main import server
 
@@ -9,13 +15,144 @@ exam_api = APIRouter(prefix="")
 
 
 @exam_api.get("/get_exam_info")
-async def _(exam: Exam = Depends(verify_exam_status)):
-    return Results(msg="查询成功！", data=exam)
+async def _(exam: Exam = Depends(verify_exam_status), if_none_match: str | None = Header(None)):
+    return server.responses.student_exam.respond(if_none_match)
+
+
+@exam_api.get("/get_exam_manifest")
+async def _(exam: Exam = Depends(verify_exam_status), if_none_match: str | None = Header(None)):
+    """
+    分块下载考试信息的清单，见PaperManifest
+    """
+    return server.responses.paper_manifest.respond(if_none_match)
+
+
+@exam_api.get("/get_exam_chunk")
+async def _(index: int, exam: Exam = Depends(verify_exam_status), if_none_match: str | None = Header(None)):
+    if (response := server.responses.paper_chunks.respond(index, if_none_match)) is None:
+        return Results(recode=401, msg="块序号不存在")
+    return response
+
+
+@exam_api.get("/get_exam_chunk/{digest}")
+async def _(digest: str, exam: Exam = Depends(verify_exam_status), if_none_match: str | None = Header(None)):
+    """
+    按sha256下载一块，URL由内容决定，可以永久缓存；考试修改后旧清单中的块不再存在，返回404
+    """
+    chunks = server.responses.paper_chunks
+    if (index := chunks.find(digest)) is None:
+        return Response(status_code=404)
+    return chunks.respond(index, if_none_match, immutable=True)
+
+
+@exam_api.get("/get_exam_detail")
+async def _(exam: Exam = Depends(verify_exam_status), token = Depends(verify_admin),
+            if_none_match: str | None = Header(None)):
+    return server.responses.exam_detail.respond(if_none_match)
 
 
 @exam_api.post("/set_exam")
 async def _(exam: Exam, token: AdminToken = Depends(verify_admin)):
-    server.exam = exam
+    await server.save_exam(exam)
+
+
+async def version_conflict(version: int | None, res: Response) -> Results | None:
+    """
+    增量修改前先追上其他进程的修改，客户端所知的版本已过时时返回409
+    """
+    await server.sync(force=True)
+    if version is not None and version != server.exam.version:
+        return conflict(res)
+    return None
+
+
+def conflict(res: Response) -> Results:
+    res.status_code = 409
+    return Results(recode=409, msg=f"考试已被修改（当前版本 {server.exam.version}），请刷新后重试")
+
+
+@exam_api.patch("/exam")
+async def _(data: ExamPatchData, res: Response, exam: Exam = Depends(verify_exam_status),
+            token = Depends(verify_admin)):
+    """
+    修改考试标题和起止时间，只需发送有变化的字段
+    """
+    if (result := await version_conflict(data.version, res)) is not None:
+        return result
+    exam = server.exam
+    start_time = data.start_time or exam.start_time
+    end_time = data.end_time or exam.end_time
+    if end_time.timestamp() <= start_time.timestamp():
+        return Results(recode=401, msg="结束时间必须晚于开始时间")
+    exam = exam.copy(update={"title": data.title if data.title is not None else exam.title,
+                             "start_time": start_time, "end_time": end_time})
+    if not await server.update_exam(exam):
+        return conflict(res)
+    return Results(msg="考试信息已修改", data={"version": exam.version})
+
+
+@exam_api.patch("/exam/roster")
+async def _(data: RosterPatchData, res: Response, exam: Exam = Depends(verify_exam_status),
+            token = Depends(verify_admin)):
+    """
+    增删考试人员，加入的考生uid已存在时更新其信息
+    """
+    if (result := await version_conflict(data.version, res)) is not None:
+        return result
+    exam = server.exam
+    removed = set(data.remove)
+    updated = {student.uid: student for student in data.add}
+    exam = exam.copy(update={"student_list": [updated.pop(student.uid, student) for student in exam.student_list
+                                              if student.uid not in removed] + list(updated.values())})
+    if not await server.update_exam(exam):
+        return conflict(res)
+    return Results(msg=f"名单已更新，共 {len(server.roster)} 名考生", data={"version": exam.version})
+
+
+@exam_api.patch("/exam/question")
+async def _(data: QuestionErrataData, res: Response, exam: Exam = Depends(verify_exam_status),
+            token = Depends(verify_admin)):
+    """
+    勘误单道题目；客观题的答案或分值变化时重新批改所有答题卡的客观题部分，
+    主观题分值降低时超过新分值的按题得分按新分值计入总分
+    """
+    if (result := await version_conflict(data.version, res)) is not None:
+        return result
+    exam = server.exam
+    if not 0 <= data.index < len(exam.paper.questions):
+        return Results(recode=401, msg="题号不存在")
+    if data.question.type != exam.paper.questions[data.index].type:
+        return Results(recode=401, msg="勘误不能改变题目类型")
+    old_key = server.answer_key
+    questions = list(exam.paper.questions)
+    questions[data.index] = data.question
+    exam = exam.copy(update={"paper": exam.paper.copy(update={"questions": questions})})
+    if not await server.update_exam(exam):
+        return conflict(res)
+    writes = []
+    regraded = 0
+    limit = server.answer_key.scores[data.index]
+    if data.question.type == "subjective":
+        if limit < old_key.scores[data.index]:  # 分值降低时，超过新分值的按题得分按新分值计
+            for sheet in server.results.iter_sheets():
+                uid = sheet.student.uid
+                if server.results.get_marks(uid).get(data.index, 0) > limit:
+                    server.results.set_mark(uid, data.index, limit)
+                    regraded += 1
+                    writes.append(server.journal.save_mark(uid, exam.uuid, data.index, limit))
+                    writes.append(server.journal.save_score(uid, exam.uuid, *server.results.get_score(uid)))
+    elif (old_key.answers[data.index], old_key.scores[data.index]) != (server.answer_key.answers[data.index], limit):
+        for sheet in server.results.iter_sheets():
+            uid = sheet.student.uid
+            total, marked = server.results.get_score(uid) or (0, False)
+            # 只替换客观题部分，保留已上传的主观题成绩
+            score = total - old_key.grade(sheet.answers) + server.answer_key.grade(sheet.answers)
+            if score != total:
+                server.results.set_score(uid, score, marked)
+                regraded += 1
+                writes.append(server.journal.save_score(uid, exam.uuid, score, marked))
+    await asyncio.gather(*writes)
+    return Results(msg=f"第 {data.index + 1} 题已勘误，{regraded} 名考生的成绩发生变化", data={"version": exam.version})
 
 
 @exam_api.get("/get_answer_sheet")
@@ -26,38 +163,202 @@ async def _(token: StudentToken = Depends(verify_student)):
 
 @exam_api.get("/get_student_sheet")
 async def _(student_uid: str, token = Depends(verify_admin)):
-    if student_uid not in server.get_sheet_uids():
+    if (sheet := server.get_student_sheet(student_uid)) is None:
         return Results(recode=401, msg="没有相应的答题卡")
-    return Results(msg="查询成功！", data=server.get_student_sheet(student_uid))
+    return Results(msg="查询成功！", data=sheet)
 
 
 @exam_api.get("/get_student_score")
 async def _(student_uid: str, token = Depends(verify_admin)):
-    if student_uid not in server.get_score_uids():
+    if (score := server.get_student_score(student_uid)) is None:
         return Results(recode=401, msg="成绩未设定")
-    return ScoreResult(recode=200, score=server.get_student_score(student_uid))
+    return ScoreResult(recode=200, score=score)
+
+
+@exam_api.get("/export_scores")
+async def _(kind: str = Query("csv", alias="format"), token = Depends(verify_admin)):
+    """
+    导出全部考生的成绩与每题得分，CSV边生成边发送，XLSX在线程中生成到临时文件后分块发送
+    """
+    if server.exam is None:
+        return Results(recode=401, msg="考试未设定")
+    if kind not in EXPORT_FORMATS:
+        return Results(recode=401, msg="不支持的导出格式")
+    export = ScoreExport(server.answer_key, server.results, server.roster)
+    headers = {"Content-Disposition": f'attachment; filename="scores.{kind}"',
+               "X-Total-Count": str(len(export))}
+    if kind == "csv":
+        return StreamingResponse(export.iter_csv(), media_type=EXPORT_FORMATS[kind], headers=headers)
+    file = tempfile.TemporaryFile()
+    await asyncio.to_thread(export.write_xlsx, file)
+    headers["Content-Length"] = str(file.tell())
+    file.seek(0)
+
+    def chunks():
+        with file:
+            while chunk := file.read(64 * 1024):
+                yield chunk
+
+    return StreamingResponse(chunks(), media_type=EXPORT_FORMATS[kind], headers=headers)
+
+
+@exam_api.get("/get_question_answers")
+async def _(index: int, offset: int = 0, limit: int = 100, token = Depends(verify_admin)):
+    """
+    按题阅卷：分页流式返回所有考生对某道主观题的作答，每行一个QuestionAnswer的JSON
+    """
+    if server.exam is None or not 0 <= index < len(server.answer_key.types):
+        return Results(recode=401, msg="题号不存在")
+    if server.answer_key.types[index] != "subjective":
+        return Results(recode=401, msg="客观题无需阅卷")
+    sheets = server.results.page_sheets(offset, limit)
+
+    def lines():
+        for sheet in sheets:
+            answer = sheet.answers[index] if index < len(sheet.answers) else ""
+            yield QuestionAnswer(uid=sheet.student.uid, answer=answer,
+                                 score=server.results.get_marks(sheet.student.uid).get(index)).json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"X-Total-Count": str(len(server.results)),
+                                      "X-Next-Offset": str(offset + len(sheets))})
+
+
+@exam_api.post("/upload_question_scores")
+async def _(data: QuestionScoreData, token = Depends(verify_admin)):
+    if server.exam is None or not 0 <= data.index < len(server.answer_key.types) \
+            or server.answer_key.types[data.index] != "subjective":
+        return Results(recode=401, msg="题号不存在或不是主观题")
+    if any(not 0 <= score <= server.answer_key.scores[data.index] for score in data.scores.values()):
+        return Results(recode=401, msg=f"本题得分应在 0 到 {server.answer_key.scores[data.index]} 分之间")
+    writes = []
+    skipped = 0
+    for uid, score in data.scores.items():
+        if not server.results.has_sheet(uid):
+            continue
+        if server.results.get_score(uid)[1] and not server.results.get_marks(uid):
+            skipped += 1  # 已通过upload_score整卷给分，总分中已含主观题得分
+            continue
+        total = server.results.set_mark(uid, data.index, score)
+        marks = server.results.get_marks(uid)
+        if all(index in marks for index in server.answer_key.subjective):  # 所有主观题都已批改
+            if not server.results.get_score(uid)[1]:
+                server.metrics.scores_finalized += 1
+            server.results.set_score(uid, total, True)
+        writes.append(server.journal.save_mark(uid, server.exam.uuid, data.index, score))
+        writes.append(server.journal.save_score(uid, server.exam.uuid, *server.results.get_score(uid)))
+    await asyncio.gather(*writes)
+    msg = f"已更新 {len(writes) // 2} 名考生的成绩"
+    if skipped:
+        msg += f"，{skipped} 名考生已整卷给分，未按题更新"
+    return Results(recode=200, msg=msg)
+
+
+async def accept_sheet(sheet: AnswerSheet, digest: str | None = None) -> Results:
+    """
+    收下一份答题卡：批改客观题并持久化答题卡与成绩
+
+    同一考生重复提交内容相同的答题卡视为成功，客户端因超时等原因重试是安全的
+    :param sheet: 答题卡
+    :param digest: 本次提交的答题卡摘要，为None时由sheet计算
+    :return: 返回给考生的结果
+    """
+    uid = sheet.student.uid
+    draft, previous = server.results.get_draft(uid), server.results.get_score(uid)
+    if not server.results.add_sheet(sheet):
+        if server.results.get_sheet(uid).digest() != (digest or sheet.digest()):
+            return Results(recode=401, msg="禁止重复提交答题卡")
+        await server.journal.flush()  # 先到的那次提交落盘后再确认
+        if not server.results.has_sheet(uid):  # 先到的那次提交持久化失败，已被撤销
+            return Results(recode=503, msg="答题卡保存失败，请重试")
+        return Results(recode=200, msg="答题卡已提交")
+    start = perf_counter()
+    score = server.answer_key.grade(sheet.answers)
+    server.metrics.grading.observe(perf_counter() - start)
+    server.results.set_score(uid, score, False)
+
+    def undo() -> None:
+        server.results.remove_sheet(uid, draft)
+        if previous is None:
+            server.results.remove_score(uid)
+        else:
+            server.results.set_score(uid, *previous)
+
+    try:
+        inserted = await server.journal.save_sheet(server.exam.uuid, sheet, score)
+    except Exception:
+        undo()  # 持久化失败时撤销内存中的答题卡和成绩，考生重试时不会被当作重复提交
+        raise
+    if not inserted:
+        # 数据库中已有该考生的答题卡（其他进程先收下了），以数据库为准
+        undo()
+        stored = await server.journal.load_sheet(server.exam.uuid, uid)
+        await server.sync(force=True)
+        if stored is None or stored.digest() != (digest or sheet.digest()):
+            return Results(recode=401, msg="禁止重复提交答题卡")
+        return Results(recode=200, msg="答题卡已提交")
+    server.metrics.sheets_received += 1
+    return Results(recode=200, msg="成功！")
 
 
 @exam_api.post("/upload_sheet")
-async def _(sheet: AnswerSheet, token: Student = Depends(verify_student)):
+async def _(sheet: AnswerSheet, token: Student = Depends(verify_student),
+            idempotency_key: str | None = Header(None)):
+    """
+    上传完整答题卡，Idempotency-Key请求头可携带答题卡摘要（见AnswerSheet.digest）供服务器核对
+    """
     if token.uid != sheet.student.uid:
         return Results(recode=401, msg="登录的uid和答题卡内uid不相符")
-    if sheet.student.uid in server.get_sheet_uids():
-        return Results(recode=401, msg="禁止重复提交答题卡")
-    server.sheets.append(sheet)
-    score = 0
-    for index, question in enumerate(server.exam.paper.questions):
-        if question.type == "objective":
-            if sheet.answers[index] == "".join(sorted([option_str_[question.options.index(i)] for i in [i for i in question.options if i.correct]])):
-                score += question.score
-    server.scores[sheet.student.uid] = (score, False)
-    return Results(recode=200, msg="成功！")
+    digest = sheet.digest()
+    if idempotency_key is not None and idempotency_key != digest:
+        return Results(recode=401, msg="幂等键与答题卡内容不符")
+    return await accept_sheet(sheet, digest)
+
+
+@exam_api.patch("/answer")
+async def _(data: AnswerPatchData, token: Student = Depends(verify_student)):
+    """
+    考试期间逐题自动保存作答，交卷前可多次覆盖
+    """
+    if server.results.has_sheet(token.uid):
+        return Results(recode=401, msg="答题卡已提交，不能再修改作答")
+    length = len(server.answer_key.types)
+    if not all(0 <= index < length for index in data.answers):
+        return Results(recode=401, msg="题号不存在")
+    if data.answers:
+        server.results.patch_draft(token.uid, data.answers, length)
+        await server.journal.save_draft(token.uid, server.exam.uuid, data.answers)
+    return Results(recode=200, msg="保存成功")
+
+
+@exam_api.post("/finalize_sheet")
+async def _(data: FinalizeData, res: Response, token: Student = Depends(verify_student)):
+    """
+    以服务器上自动保存的作答交卷，考生只需提交答题卡摘要；摘要不一致时返回409，考生应改用upload_sheet上传完整答题卡
+    """
+    if (submitted := server.results.get_sheet(token.uid)) is not None:  # 重复交卷，按摘要判断是否为重试
+        return await accept_sheet(submitted, data.digest)
+    if (draft := server.results.get_draft(token.uid)) is None:
+        draft = [""] * len(server.answer_key.types)
+    # 与客户端上传的答题卡一样不带密码，名单中的密码哈希不会写入答题卡、阅卷接口和成绩导出
+    sheet = AnswerSheet(student=Student(uid=token.uid, nickname=token.nickname, password=""),
+                        exam_id=server.exam.uuid, answers=list(draft))
+    if sheet.digest() != data.digest:
+        res.status_code = 409
+        return Results(recode=409, msg="服务器保存的作答与本地答题卡不一致，请上传完整答题卡")
+    return await accept_sheet(sheet, data.digest)
 
 
 @exam_api.post("/upload_score")
-async def _(data: ScoreData):
-    if not server.scores[data.uid][1]:
-        server.scores[data.uid] = (server.scores[data.uid][0] + data.score, True)
+async def _(data: ScoreData, token = Depends(verify_admin)):
+    if (score := server.results.get_score(data.uid)) is None:
+        return Results(recode=401, msg="成绩未设定")
+    if server.results.get_marks(data.uid):
+        return Results(recode=401, msg="该考生已按题批改，请继续按题上传成绩")
+    if not score[1]:
+        server.results.set_score(data.uid, score[0] + data.score, True)
+        server.metrics.scores_finalized += 1
+        await server.journal.save_score(data.uid, server.exam.uuid, score[0] + data.score, True)
         return Results(recode=200, msg="更新成功")
     else:
         return Results(recode=401, msg="禁止重复上传成绩")
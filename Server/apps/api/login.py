@@ -6,9 +6,8 @@ from datetime import datetime, timedelta, timezone
 from fastapi import Response, Depends
 from fastapi import APIRouter
 
-from Server.SQLScript import SQLCommand
 from Server.main import server
-from Server.tools.verify import verify_exam_status
+from Server.tools.verify import verify_exam_status, verify_admin
 from Core import *
 
 login_api = APIRouter(prefix="")
@@ -16,16 +15,18 @@ login_api = APIRouter(prefix="")
 
 @login_api.post("/login", response_model=LoginResults)
 async def _(login: LoginData, res: Response, exam: Exam = Depends(verify_exam_status)):
-    data = (await server.student_conn.execute_fetchall(SQLCommand.GetStudentInfo, {"uid": login.uid}))
-    if not data:
+    if exam.student_list:
+        student = server.roster.get(login.uid)
+    else:  # 名单为空的考试对考生库中的所有考生开放
+        student = await server.students.get(login.uid)
+    if student is None:
         return LoginResults(success=False, msg="账号不存在，请重试")
-    data = data[0]
-    student = Student(uid=data[0], nickname=data[1], password=sha256(data[2].encode("utf-8")).hexdigest())
-    if not compare_digest(student.password.upper(), login.password.upper()):
+    if not await server.passwords.verify(student.password, login.password):
         return LoginResults(success=False, msg="账号或密码错误，请重试")
-    cookie = StudentToken(exam_id=exam.uuid, token=sha256(f"{student.uid}{server.salt}{exam.uuid}".encode("utf-8")).hexdigest(), student=student)
+    public = Student(uid=student.uid, nickname=student.nickname, password="")  # 名单中的密码哈希不发给客户端
+    cookie = StudentToken(exam_id=exam.uuid, token=sha256(f"{student.uid}{server.salt}{exam.uuid}".encode("utf-8")).hexdigest(), student=public)
     res.set_cookie("token", b64encode(cookie.json().encode('UTF-8')).decode("UTF-8"))
-    return LoginResults(success=True, data=student)
+    return LoginResults(success=True, data=public)
 
 
 @login_api.post("/admin_login")
@@ -37,3 +38,20 @@ async def _(login: LoginData, res: Response):
     cookie = AdminToken(token=sha256(f"{server.admin_password}{server.salt}".encode("utf-8")).hexdigest())
     res.set_cookie("token", b64encode(cookie.json().encode("utf-8")).decode("utf-8"), expires=datetime.now(timezone.utc)+timedelta(days=10))
     return LoginResults(success=True, data=Student(uid="0", password=server.admin_password, nickname="admin"))
+
+
+@login_api.post("/upload_students")
+async def _(students: list[Student], replace: bool = False, token = Depends(verify_admin)):
+    """
+    批量导入考生库，只写入有变化的考生，replace为True时删除不在名单中的考生
+    """
+    diff = await server.students.upsert(students, replace)
+    return Results(msg=f"新增 {diff.inserted} 名，更新 {diff.updated} 名，未变 {diff.unchanged} 名，"
+                       f"删除 {diff.deleted} 名考生", data=diff._asdict())
+
+
+@login_api.get("/get_token_cache_stats")
+async def _(token = Depends(verify_admin)):
+    return Results(msg="查询成功！", data={"student": server.student_tokens.stats(),
+                                          "admin": server.admin_tokens.stats(),
+                                          "password": server.passwords.verified.stats()})
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from Server.main import server
+
+metrics_api = APIRouter(prefix="")
+
+
+@metrics_api.get("/metrics")
+async def _():
+    """
+    Prometheus格式的运行指标
+    """
+    return Response(content=server.metrics.render({"student": server.student_tokens, "admin": server.admin_tokens,
+                                                           "password": server.passwords.verified}),
+                    media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,54 @@
+from typing import NamedTuple
+
+from Core.models import Paper, option_str_
+
+
+class AnswerKey(NamedTuple):
+    """
+    预编译的答案表，设定考试时由试卷生成一次，批改答题卡时直接查表，不再逐份重新计算正确选项
+    """
+    answers: tuple[str | None, ...]  # 每题的正确选项串（按字母排序），主观题为None
+    scores: tuple[int, ...]  # 每题分值
+    types: tuple[str, ...]  # 每题类型
+    objective: tuple[tuple[int, str, int], ...]  # 客观题的（题号，正确选项串，分值），批改时只遍历这部分
+    subjective: tuple[int, ...]  # 主观题题号
+
+    @classmethod
+    def compile(cls, paper: Paper) -> "AnswerKey":
+        """
+        将试卷编译为答案表
+
+        参数：
+            paper(Paper): 考试使用的试卷
+
+        返回：
+            AnswerKey: 不可变的答案表
+        """
+        answers = []
+        for question in paper.questions:
+            if question.type == "objective":
+                answers.append("".join(sorted(option_str_[index] for index, option in enumerate(question.options)
+                                              if option.correct)))
+            else:
+                answers.append(None)
+        scores = tuple(question.score for question in paper.questions)
+        return cls(
+            answers=tuple(answers),
+            scores=scores,
+            types=tuple(question.type for question in paper.questions),
+            objective=tuple((index, answer, scores[index]) for index, answer in enumerate(answers) if answer is not None),
+            subjective=tuple(index for index, answer in enumerate(answers) if answer is None)
+        )
+
+    def grade(self, answers: list[str]) -> int:
+        """
+        批改一份答题卡的客观题部分
+
+        参数：
+            answers(list[str]): 答题卡上的作答，与试卷题目一一对应
+
+        返回：
+            int: 客观题得分
+        """
+        length = len(answers)
+        return sum(score for index, answer, score in self.objective if index < length and answers[index] == answer)
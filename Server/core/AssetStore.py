@@ -0,0 +1,145 @@
+from hashlib import sha256
+from mimetypes import guess_type
+from pathlib import Path
+import os
+import re
+
+import anyio
+from fastapi.responses import Response
+
+CHUNK_SIZE = 64 * 1024
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def file_digest(path: Path) -> str:
+    digest = sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AssetStore:
+    """
+    按内容哈希（sha256）索引的试卷资源文件
+
+    启动时扫描各试卷文件夹下的assets/目录建立索引；管理端上传的资源以<哈希><扩展名>命名保存在root中。
+    内容相同的文件只保存一份，资源一经发布就不会改变，因此可以让客户端永久缓存。
+    """
+    def __init__(self, root: Path):
+        self.root: Path = root  # 上传资源的保存目录
+        self.assets: dict[str, Path] = {}  # 哈希为key，文件路径为value
+
+    def __len__(self) -> int:
+        return len(self.assets)
+
+    def scan(self, directory: Path) -> int:
+        """
+        索引目录下所有assets/文件夹中的文件，文件较多时应在线程中调用
+        :param directory: 试卷根目录
+        :return: 新索引的文件数
+        """
+        count = 0
+        if not directory.exists():
+            return 0
+        for path in directory.rglob("*"):
+            if path.is_file() and path.parent.name == "assets" and not path.name.endswith(".tmp"):
+                if (digest := file_digest(path)) not in self.assets:
+                    self.assets[digest] = path
+                    count += 1
+        return count
+
+    def get(self, digest: str) -> Path | None:
+        """
+        查找资源文件，多进程模式下其他进程刚上传的资源不在本进程的索引中，按文件名在root中查找
+        :param digest: 资源的sha256
+        :return: 文件路径，不存在时返回None
+        """
+        if (path := self.assets.get(digest)) is not None:
+            return path
+        if not DIGEST_PATTERN.fullmatch(digest) or not self.root.exists():
+            return None
+        for path in self.root.glob(f"{digest}*"):
+            # 只认<哈希>或<哈希><扩展名>，其他进程正在写入的.tmp文件随后会被改名
+            if path.name.endswith(".tmp") or path.name != digest and not path.name.startswith(f"{digest}."):
+                continue
+            self.assets[digest] = path
+            return path
+        return None
+
+    def put(self, data: bytes, suffix: str = "") -> str:
+        """
+        保存一个资源，内容已存在时不重复保存
+        :param data: 文件内容
+        :param suffix: 扩展名，用于推断Content-Type
+        :return: 资源的sha256
+        """
+        digest = sha256(data).hexdigest()
+        if self.get(digest) is not None:
+            return digest
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{digest}{suffix}"
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")  # 多个进程同时上传同一资源时各写各的临时文件
+        temp.write_bytes(data)
+        os.replace(temp, path)
+        self.assets[digest] = path
+        return digest
+
+
+class AssetResponse(Response):
+    """
+    资源文件响应，支持单个Range请求
+
+    服务器提供ASGI zerocopy扩展时直接让内核发送文件（sendfile），否则按块读取发送。
+    """
+    def __init__(self, path: Path, digest: str, range_header: str | None = None):
+        size = path.stat().st_size
+        self.path: Path = path
+        self.start, self.end = 0, size
+        status_code = 200
+        headers = {
+            "ETag": f'"{digest}"',
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Accept-Ranges": "bytes"
+        }
+        if range_header is not None and (match := RANGE_PATTERN.fullmatch(range_header.strip())) is not None \
+                and any(match.groups()):
+            first, last = match.groups()
+            if not first:  # bytes=-N，最后N个字节
+                self.start = max(size - int(last), 0)
+            else:
+                self.start = int(first)
+                self.end = min(int(last) + 1, size) if last else size
+            if self.start >= self.end:
+                status_code = 416
+                self.start = self.end = 0
+                headers["Content-Range"] = f"bytes */{size}"
+            else:
+                status_code = 206
+                headers["Content-Range"] = f"bytes {self.start}-{self.end - 1}/{size}"
+        headers["Content-Length"] = str(self.end - self.start)
+        super().__init__(status_code=status_code, headers=headers,
+                         media_type=guess_type(path.name)[0] or "application/octet-stream")
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or self.start == self.end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if "http.response.zerocopy" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopy", "file": file.fileno(), "offset": self.start,
+                            "count": self.end - self.start, "more_body": False})
+            return
+        async with await anyio.open_file(self.path, "rb") as file:
+            await file.seek(self.start)
+            remaining = self.end - self.start
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:  # 文件被截断时提前结束
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,267 @@
+from pathlib import Path
+from time import time
+import asyncio
+import os
+
+import ujson as json
+
+from aiosqlite import connect, Connection
+
+from Server.SQLScript import SQLScript, SQLCommand
+from Server.core.ResultStore import ResultStore
+from Core.models import *
+
+
+class Journal:
+    """
+    答题卡与成绩的持久化日志，写入Student.db（WAL模式）
+
+    写入采用组提交：每批等待若干毫秒收集写入请求，整批只提交（fsync）一次，
+    调用方await到所在批次落盘后才返回，因此交卷高峰期的fsync次数与批次数而不是答题卡数成正比。
+
+    多进程模式下，每次写入还会在Change表追加一条变更记录，各进程据此追上其他进程的写入。
+    各进程定期在Worker表登记已同步到的变更序号，所有存活进程都已处理过的变更记录随即删除。
+    """
+    def __init__(self, path: Path, interval: float = 0.005, shared: bool = False, worker_timeout: float = 60.0):
+        self.path: Path = path
+        self.interval: float = interval  # 每批收集写入的时长，单位秒
+        self.worker_timeout: float = worker_timeout  # 超过该时长未登记进度的进程视为已退出，不再阻止清理，单位秒
+        self.shared: bool = shared  # 是否为多进程共享模式
+        self.origin: int = os.getpid()  # 本进程写入的变更记录的来源标识
+        self.conn: Connection | None = None
+        # 队列中每项为(语句, 参数, Future)；语句为列表时是一组条件写入，见write_if_inserted
+        self.queue: asyncio.Queue[tuple[str | list[tuple[str, dict]], dict, asyncio.Future]] | None = None
+        self.task: asyncio.Task | None = None
+        self.lock: asyncio.Lock | None = None  # 提交批次与update_exam的事务不交错
+        self.batches: int = 0  # 已提交的批次数
+
+    async def open(self) -> None:
+        """
+        打开日志连接并启动后台提交任务，需要在服务器的事件循环中调用
+        :return: 无
+        """
+        self.conn = await connect(self.path.resolve())
+        await self.conn.executescript(SQLScript.InitJournal)
+        self.queue = asyncio.Queue()
+        self.lock = asyncio.Lock()
+        self.task = asyncio.create_task(self._commit_loop())
+
+    async def close(self) -> None:
+        """
+        提交剩余写入并关闭连接
+        :return: 无
+        """
+        if self.task is not None:
+            await self.flush()
+            self.task.cancel()
+            self.task = None
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    def write(self, sql: str, params: dict) -> asyncio.Future:
+        """
+        加入一条写入，返回的Future在所在批次提交后完成
+        :param sql: SQL语句
+        :param params: 语句参数
+        :return: 提交完成的Future
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((sql, params, future))
+        return future
+
+    def write_if_inserted(self, steps: list[tuple[str, dict]]) -> asyncio.Future:
+        """
+        加入一组写入，第一条（INSERT OR IGNORE）确实插入了新行时才执行其余各条，与其他写入在同一批次提交
+        :param steps: (SQL语句, 语句参数)的列表
+        :return: 提交完成的Future，结果为第一条是否插入了新行
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((steps, {}, future))
+        return future
+
+    async def flush(self) -> None:
+        """
+        等待此前加入的所有写入提交
+        :return: 无
+        """
+        if self.task is not None:
+            await self.write("", {})  # 空语句不执行，只用于等待所在批次提交
+
+    async def _commit_loop(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(self.interval)
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            results = {}  # 条件写入在批次中的位置 -> 是否插入了新行
+            try:
+                async with self.lock:
+                    # 相邻的相同语句合并为一次executemany，条件写入逐组执行
+                    start = 0
+                    for end in range(1, len(batch) + 1):
+                        if end == len(batch) or batch[end][0] != batch[start][0] \
+                                or not isinstance(batch[start][0], str):
+                            if not isinstance(batch[start][0], str):
+                                results[start] = await self._execute_if_inserted(batch[start][0])
+                            elif batch[start][0]:
+                                await self.conn.executemany(batch[start][0], [item[1] for item in batch[start:end]])
+                            start = end
+                    await self.conn.commit()
+            except Exception as e:
+                await self.conn.rollback()
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                self.batches += 1
+                for index, (_, _, future) in enumerate(batch):
+                    if not future.done():
+                        future.set_result(results.get(index))
+
+    async def _execute_if_inserted(self, steps: list[tuple[str, dict]]) -> bool:
+        cursor = await self.conn.execute(*steps[0])
+        if cursor.rowcount != 1:
+            return False
+        for sql, params in steps[1:]:
+            await self.conn.execute(sql, params)
+        return True
+
+    def change(self, kind: str, exam_id: str, uid: str, data: str) -> None:
+        """
+        多进程模式下追加一条变更记录，与对应的写入在同一批次提交
+        :param kind: 变更类型，exam、patch、sheet、score、mark或draft
+        :param exam_id: 考试uuid
+        :param uid: 考生uid
+        :param data: 变更内容
+        :return: 无
+        """
+        if self.shared:
+            self.write(SQLCommand.InsertChange, {"origin": self.origin, "kind": kind, "exam_id": exam_id,
+                                                 "uid": uid, "data": data})
+
+    def save_exam(self, exam: Exam) -> asyncio.Future:
+        future = self.write(SQLCommand.SaveExam, {"uuid": exam.uuid, "data": exam.json(), "time": time()})
+        self.change("exam", exam.uuid, "", exam.uuid)
+        return future
+
+    async def update_exam(self, exam: Exam, version: int) -> bool:
+        """
+        比较并交换：日志中该考试仍是version版本时才写入修改后的考试，多个进程同时修改时只有一个成功。
+        不经过组提交，写入与变更记录在同一事务中立即提交
+        :param exam: 修改后的考试
+        :param version: 修改所基于的版本
+        :return: 写入成功时返回True，考试已被其他请求修改时返回False
+        """
+        async with self.lock:
+            try:
+                cursor = await self.conn.execute(SQLCommand.UpdateExam, {"uuid": exam.uuid, "data": exam.json(),
+                                                                         "time": time(), "version": version})
+                if cursor.rowcount != 1:
+                    await self.conn.rollback()
+                    return False
+                if self.shared:
+                    await self.conn.execute(SQLCommand.InsertChange, {"origin": self.origin, "kind": "patch",
+                                                                      "exam_id": exam.uuid, "uid": "",
+                                                                      "data": exam.uuid})
+                await self.conn.commit()
+            except Exception:
+                await self.conn.rollback()
+                raise
+        return True
+
+    def save_sheet(self, exam_id: str, sheet: AnswerSheet, score: int) -> asyncio.Future:
+        """
+        写入答题卡及其客观题成绩。是否重复提交由数据库判断：该考生已有答题卡（如已由其他进程收下）时
+        不写入任何内容，多进程模式下本地的ResultStore可能还未同步到其他进程收下的答题卡
+        :param exam_id: 考试uuid
+        :param sheet: 答题卡
+        :param score: 客观题成绩
+        :return: 提交完成的Future，结果为是否写入了答题卡
+        """
+        uid, data = sheet.student.uid, sheet.json()
+        steps = [(SQLCommand.InsertSheet, {"uid": uid, "exam_id": exam_id, "data": data}),
+                 (SQLCommand.UpsertScore, {"uid": uid, "exam_id": exam_id, "score": score, "marked": 0})]
+        if self.shared:
+            for kind, change in (("sheet", data), ("score", json.dumps([score, False]))):
+                steps.append((SQLCommand.InsertChange, {"origin": self.origin, "kind": kind, "exam_id": exam_id,
+                                                        "uid": uid, "data": change}))
+        return self.write_if_inserted(steps)
+
+    async def load_sheet(self, exam_id: str, uid: str) -> AnswerSheet | None:
+        rows = await self.conn.execute_fetchall(SQLCommand.GetSheet, {"uid": uid, "exam_id": exam_id})
+        return AnswerSheet.parse_raw(rows[0][0]) if rows else None
+
+    def save_score(self, uid: str, exam_id: str, score: int, marked: bool) -> asyncio.Future:
+        future = self.write(SQLCommand.UpsertScore, {"uid": uid, "exam_id": exam_id, "score": score,
+                                                     "marked": int(marked)})
+        self.change("score", exam_id, uid, json.dumps([score, marked]))
+        return future
+
+    def save_mark(self, uid: str, exam_id: str, question: int, score: int) -> asyncio.Future:
+        future = self.write(SQLCommand.UpsertMark, {"uid": uid, "exam_id": exam_id, "question": question,
+                                                    "score": score})
+        self.change("mark", exam_id, uid, json.dumps([question, score]))
+        return future
+
+    def save_draft(self, uid: str, exam_id: str, answers: dict[int, str]) -> asyncio.Future:
+        future = None
+        for question, answer in answers.items():
+            future = self.write(SQLCommand.UpsertDraft, {"uid": uid, "exam_id": exam_id, "question": question,
+                                                         "answer": answer})
+        self.change("draft", exam_id, uid, json.dumps(answers, ensure_ascii=False))
+        return future  # 同一次调用的写入总在同一批次或更早的批次中，等待最后一条即可
+
+    def report_progress(self, seq: int) -> asyncio.Future | None:
+        """
+        多进程模式下登记本进程已同步到的变更序号，并删除所有存活进程都已处理过的变更记录
+        :param seq: 已同步到的变更序号
+        :return: 提交完成的Future，非多进程模式时返回None
+        """
+        if not self.shared:
+            return None
+        now = time()
+        self.write(SQLCommand.UpsertWorker, {"origin": self.origin, "seq": seq, "time": now})
+        return self.write(SQLCommand.PruneChanges, {"since": now - self.worker_timeout})
+
+    async def last_change(self) -> int:
+        return (await self.conn.execute_fetchall(SQLCommand.GetLastChange))[0][0]
+
+    async def read_changes(self, seq: int) -> tuple[int, list[tuple[str, str, str, str]]]:
+        """
+        读取其他进程在某条变更记录之后的写入
+        :param seq: 已处理到的变更序号
+        :return: 最新的变更序号，以及(类型, 考试uuid, 考生uid, 内容)的列表，按序号排列
+        """
+        rows = await self.conn.execute_fetchall(SQLCommand.GetChanges, {"seq": seq})
+        if not rows:
+            return seq, []
+        return rows[-1][0], [(kind, exam_id, uid, data) for _, origin, kind, exam_id, uid, data in rows
+                             if origin != self.origin]
+
+    async def load_exam(self, uuid: str) -> Exam | None:
+        rows = await self.conn.execute_fetchall(SQLCommand.GetExam, {"uuid": uuid})
+        return Exam.parse_raw(rows[0][0]) if rows else None
+
+    async def load_latest_exam(self) -> Exam | None:
+        rows = await self.conn.execute_fetchall(SQLCommand.GetLatestExam)
+        return Exam.parse_raw(rows[0][0]) if rows else None
+
+    async def load_results(self, exam: Exam) -> ResultStore:
+        """
+        从日志重建某场考试的答题卡、成绩与未交卷的作答
+        :param exam: 考试
+        :return: 重建的结果存储
+        """
+        exam_id, length = exam.uuid, len(exam.paper.questions)
+        results = ResultStore()
+        for (data,) in await self.conn.execute_fetchall(SQLCommand.GetSheets, {"exam_id": exam_id}):
+            results.add_sheet(AnswerSheet.parse_raw(data))
+        for uid, score, marked in await self.conn.execute_fetchall(SQLCommand.GetScores, {"exam_id": exam_id}):
+            results.set_score(uid, score, bool(marked))
+        for uid, question, score in await self.conn.execute_fetchall(SQLCommand.GetMarks, {"exam_id": exam_id}):
+            results.marks.setdefault(uid, {})[question] = score  # 总分中已包含各题得分，不再重复计入
+        for uid, question, answer in await self.conn.execute_fetchall(SQLCommand.GetDrafts, {"exam_id": exam_id}):
+            if not results.has_sheet(uid) and question < length:  # 已交卷考生的作答以答题卡为准
+                results.patch_draft(uid, {question: answer}, length)
+        return results
@@ -1,54 +1,235 @@
 from pathlib import Path
 from uuid import uuid4
+from time import monotonic
 import hashlib
 import asyncio
+import os
 
-from aiosqlite import connect, Connection, Cursor
+import ujson as json
+
+from aiosqlite import connect
 from fastapi import FastAPI
 from uvicorn import run
 
 from Server.SQLScript import SQLScript, SQLCommand
+from Server.core.AnswerKey import AnswerKey
+from Server.core.ResultStore import ResultStore
+from Server.core.Journal import Journal
+from Server.core.ResponseCache import ExamResponses
+from Server.core.TokenCache import TokenCache
+from Server.core.Roster import Roster
+from Server.core.Metrics import Metrics, MetricsMiddleware
+from Server.core.AssetStore import AssetStore
+from Server.core.StudentDirectory import StudentDirectory
+from Server.core.PasswordVerifier import PasswordVerifier
 from Core.models import *
 
 
-async def init_student_database(exists: bool, path: Path):
-    if not exists:
-        path.touch()
-    student_conn = await connect(path.resolve())
-    student_cur = await student_conn.cursor()
-    if not exists:
-        await student_cur.executescript(SQLScript.InitStudentDatabase)
-        await student_conn.commit()
-    return student_cur, student_conn
+async def init_student_database(path: Path) -> None:
+    """
+    首次启动时创建Student.db及其表；建表后即关闭连接，运行期间的读写由StudentDirectory与Journal各自的连接完成
+    :param path: 数据库路径
+    :return: 无
+    """
+    if path.exists():
+        return
+    path.touch()
+    async with connect(path.resolve()) as conn:
+        await conn.executescript(SQLScript.InitStudentDatabase)
+        await conn.commit()
 
 
 class LatexamServer:
     def __init__(self, exam: Exam | None = None, admin_password: str = "admin"):
         STUDENT_DATABASE = Path("./database/Student.db")
-        student = STUDENT_DATABASE
-        exists = student.exists()
-        student_cur, student_conn = asyncio.run(init_student_database(exists, student))
-        self.student_conn: Connection = student_conn
-        self.student_cur: Cursor = student_cur
-        self.exam: Exam | None = exam
+        asyncio.run(init_student_database(STUDENT_DATABASE))
+        self.exam: Exam | None = None
+        self.answer_key: AnswerKey | None = None
+        self.responses: ExamResponses | None = None  # 预先序列化的考试级响应
         self.app = FastAPI(title="Latexam-Server")
-        self.student_list: list[Student] = []
-        self.salt: str = uuid4().hex
+        self.roster: Roster = Roster()  # 考试人员名单索引
+        # 多进程模式下由主进程生成盐并通过环境变量传给各工作进程，保证任一进程签发的cookie在其他进程同样有效
+        self.salt: str = os.environ.get("LATEXAM_SALT") or uuid4().hex
+        self.workers: int = int(os.environ.get("LATEXAM_WORKERS", "1"))
+        self.sync_interval: float = 0.02  # 多进程模式下同步其他进程写入的最短间隔，单位秒
+        self.synced_at: float = 0.0
+        self.sync_task: asyncio.Task | None = None  # 正在进行的同步，并发请求共同等待它完成
+        self.heartbeat_interval: float = 5.0  # 多进程模式下主动同步并登记同步进度的间隔，单位秒
+        self.heartbeat_task: asyncio.Task | None = None
+        self.change_seq: int = 0  # 已同步到的变更序号
         self.admin_password: str = hashlib.sha256(admin_password.encode("utf-8")).hexdigest()
-        self.sheets: list[AnswerSheet] = []
-        self.scores: dict[str, tuple[int, bool]] = {}    # uid为key，分数和是否主观题阅卷为value
+        self.results: ResultStore = ResultStore()
+        self.students: StudentDirectory = StudentDirectory(STUDENT_DATABASE)  # 考生库
+        self.journal: Journal = Journal(STUDENT_DATABASE, shared=self.workers > 1)
+        self.student_tokens: TokenCache = TokenCache()  # 已验证的考生cookie
+        self.admin_tokens: TokenCache = TokenCache(64)  # 已验证的管理员cookie
+        self.passwords: PasswordVerifier = PasswordVerifier()  # 登录密码校验
+        self.metrics: Metrics = Metrics()
+        self.assets: AssetStore = AssetStore(Path("./papers/assets"))  # 试卷资源文件
+        self.app.add_middleware(MetricsMiddleware, metrics=self.metrics)
+        if exam is not None:
+            self.set_exam(exam)
+        self.app.add_event_handler("startup", self.startup)
+        self.app.add_event_handler("shutdown", self.shutdown)
+
+    def run(self, host: str = "0.0.0.0", port: int = 8080, workers: int = 1):
+        """
+        启动服务器
+        :param host: 监听地址
+        :param port: 监听端口
+        :param workers: 工作进程数，大于1时各进程通过Student.db共享考试、cookie和结果
+        :return: 无
+        """
+        if workers <= 1:
+            run(self.app, host=host, port=port)
+            return
+        os.environ["LATEXAM_SALT"] = self.salt
+        os.environ["LATEXAM_WORKERS"] = str(workers)
+        run("Server.main:app", host=host, port=port, workers=workers)
+
+    async def startup(self) -> None:
+        """
+        打开持久化日志，并从日志恢复最近一场考试及其答题卡和成绩，同时索引试卷资源文件
+        :return: 无
+        """
+        await asyncio.to_thread(self.assets.scan, Path("./papers"))
+        await self.journal.open()
+        self.change_seq = await self.journal.last_change()
+        if self.journal.shared:
+            await self.journal.report_progress(self.change_seq)  # 先登记进度，之后的变更记录不会在本进程同步前被清理
+            self.heartbeat_task = asyncio.create_task(self._heartbeat())
+        if self.exam is None:
+            if (exam := await self.journal.load_latest_exam()) is None:
+                return
+            self.set_exam(exam)
+        else:
+            await self.journal.save_exam(self.exam)
+        self.results = await self.journal.load_results(self.exam)
+
+    async def shutdown(self) -> None:
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+        await self.journal.close()
+        await self.students.close()
+        self.passwords.shutdown()
+
+    def set_exam(self, exam: Exam, results: ResultStore | None = None) -> None:
+        """
+        设定考试，将试卷预编译为答案表供批改使用，预先序列化考试级响应，并建立考试人员名单索引
+        :param exam: 新的考试
+        :param results: 该考试已有的答题卡与成绩，为None时保留当前结果
+        :return: 无
+        """
+        self.answer_key = AnswerKey.compile(exam.paper)
+        self.responses = ExamResponses.build(exam)
+        self.roster = Roster(exam.student_list)
+        self.exam = exam
+        # 考试变化后旧的cookie不再有效
+        self.student_tokens.clear()
+        self.admin_tokens.clear()
+        if results is not None:
+            self.results = results
+
+    async def sync(self, force: bool = False) -> None:
+        """
+        多进程模式下，从变更记录追上其他进程写入的考试、答题卡、作答和成绩
+        :param force: 为True时不受最短同步间隔限制
+        :return: 无
+        """
+        if not self.journal.shared:
+            return
+        if self.sync_task is None or self.sync_task.done():
+            if not force and monotonic() - self.synced_at < self.sync_interval:
+                return
+            self.synced_at = monotonic()
+            self.sync_task = asyncio.create_task(self._apply_changes())
+        await asyncio.shield(self.sync_task)
+
+    async def _heartbeat(self) -> None:
+        # 没有请求的进程也定期同步，否则它的进度会一直阻止变更记录被清理
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.sync(force=True)
+                await self.journal.report_progress(self.change_seq)
+            except Exception:
+                pass  # 数据库暂时繁忙时等下一次再试
+
+    async def _apply_changes(self) -> None:
+        self.change_seq, changes = await self.journal.read_changes(self.change_seq)
+        for kind, exam_id, uid, data in changes:
+            if kind == "exam":
+                if (exam := await self.journal.load_exam(data)) is None:
+                    continue
+                if self.exam is None or self.exam.uuid != exam.uuid:
+                    self.set_exam(exam, await self.journal.load_results(exam))
+                else:
+                    self.set_exam(exam)
+            elif kind == "patch":
+                if self.exam is not None and self.exam.uuid == exam_id \
+                        and (exam := await self.journal.load_exam(data)) is not None:
+                    self.patch_exam(exam)
+            elif self.exam is None or exam_id != self.exam.uuid:
+                continue
+            elif kind == "sheet":
+                self.results.add_sheet(AnswerSheet.parse_raw(data))
+            elif kind == "score":
+                score, marked = json.loads(data)
+                self.results.set_score(uid, score, marked)
+            elif kind == "mark":
+                question, score = json.loads(data)
+                self.results.marks.setdefault(uid, {})[question] = score  # 总分由随后的score变更给出
+            elif kind == "draft":
+                if not self.results.has_sheet(uid):
+                    self.results.patch_draft(uid, {int(question): answer for question, answer in json.loads(data).items()},
+                                             len(self.exam.paper.questions))
 
-    def run(self, host: str = "0.0.0.0", port: int = 8080):
-        run(self.app, host=host, port=port)
+    async def save_exam(self, exam: Exam) -> None:
+        """
+        持久化并设定考试，切换到另一场考试时从日志载入该考试已有的结果
+        :param exam: 新的考试
+        :return: 无
+        """
+        await self.journal.save_exam(exam)
+        if self.exam is None or self.exam.uuid != exam.uuid:
+            self.set_exam(exam, await self.journal.load_results(exam))
+        else:
+            self.set_exam(exam)
 
-    def get_sheet_uids(self) -> list[str]:
-        return [i.student.uid for i in self.sheets]
+    async def update_exam(self, exam: Exam) -> bool:
+        """
+        增量修改当前考试：exam是修改后的副本，其version仍是修改所基于的版本。
+        以该版本在日志中比较并交换，成功后版本号加1并替换当前考试
+        :param exam: 修改后的考试
+        :return: 成功时返回True，考试已被其他请求或进程修改时返回False
+        """
+        version = exam.version
+        exam.version += 1
+        if not await self.journal.update_exam(exam, version):
+            exam.version = version
+            return False
+        self.patch_exam(exam)
+        return True
 
-    def get_student_sheet(self, uid: str) -> AnswerSheet:
-        return [i for i in self.sheets if i.student.uid == uid][0]
+    def patch_exam(self, exam: Exam) -> None:
+        """
+        替换为同一场考试的新版本，重建答案表、考试级响应和名单索引；
+        与set_exam不同，只有考生被移出名单时才清除考生cookie缓存，管理员cookie保持有效
+        :param exam: 新版本的考试
+        :return: 无
+        """
+        roster = Roster(exam.student_list)
+        if any(uid not in roster for uid in self.roster.entries):
+            self.student_tokens.clear()  # 已缓存的cookie不再经过名单检查
+        self.answer_key = AnswerKey.compile(exam.paper)
+        self.responses = ExamResponses.build(exam)
+        self.roster = roster
+        self.exam = exam
 
-    def get_score_uids(self) -> list[str]:
-        return [i for i in self.scores.keys()]
+    def get_student_sheet(self, uid: str) -> AnswerSheet | None:
+        return self.results.get_sheet(uid)
 
-    def get_student_score(self, student_uid: str) -> int:
-        return self.scores[student_uid][0]
+    def get_student_score(self, student_uid: str) -> int | None:
+        if (score := self.results.get_score(student_uid)) is None:
+            return None
+        return score[0]
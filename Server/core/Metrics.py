@@ -0,0 +1,140 @@
+from bisect import bisect_left
+from time import perf_counter
+import os
+
+# 延迟直方图的桶上界，单位秒
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+GRADING_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+# 需要统计的接口路径与其在指标中的名称
+ROUTES = {
+    "/api/v1/login": "login",
+    "/api/v1/get_exam_info": "get_exam_info",
+    "/api/v1/get_exam_manifest": "get_exam_manifest",
+    "/api/v1/get_exam_chunk": "get_exam_chunk",
+    "/api/v1/upload_sheet": "upload_sheet",
+    "/api/v1/answer": "answer",
+    "/api/v1/finalize_sheet": "finalize_sheet",
+    "/api/v1/upload_score": "upload_score"
+}
+
+
+class Histogram:
+    """
+    固定桶的直方图，每个桶只记录落在其中的次数，输出时再累加为Prometheus要求的累计计数
+    """
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets: tuple[float, ...] = buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)  # 最后一个桶对应+Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        labels = labels.rstrip(",")
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class Metrics:
+    """
+    服务器运行指标，以Prometheus文本格式输出
+
+    所有指标都只在事件循环线程中更新，因此用普通的整数和浮点数累加即可，不需要加锁。
+    多进程模式下每个工作进程各自统计，输出中带有worker标签以区分。
+    """
+    def __init__(self):
+        self.worker: str = str(os.getpid())
+        self.requests: dict[str, dict[int, int]] = {route: {} for route in ROUTES.values()}  # 按状态码计数
+        self.latency: dict[str, Histogram] = {route: Histogram(LATENCY_BUCKETS) for route in ROUTES.values()}
+        self.in_flight: dict[str, int] = {route: 0 for route in ROUTES.values()}
+        self.sheets_received: int = 0
+        self.scores_finalized: int = 0
+        self.grading: Histogram = Histogram(GRADING_BUCKETS)
+
+    def render(self, caches: dict) -> str:
+        """
+        生成Prometheus文本格式的指标
+        :param caches: 名称到TokenCache的映射，输出其命中统计
+        :return: 指标文本
+        """
+        worker = f'worker="{self.worker}"'
+        lines = ["# HELP latexam_requests_total 各接口已完成的请求数",
+                 "# TYPE latexam_requests_total counter"]
+        for route, statuses in self.requests.items():
+            for status, count in sorted(statuses.items()):
+                lines.append(f'latexam_requests_total{{{worker},route="{route}",status="{status}"}} {count}')
+        lines += ["# HELP latexam_request_duration_seconds 各接口的请求耗时",
+                  "# TYPE latexam_request_duration_seconds histogram"]
+        for route, histogram in self.latency.items():
+            lines += histogram.render("latexam_request_duration_seconds", f'{worker},route="{route}",')
+        lines += ["# HELP latexam_requests_in_flight 各接口正在处理的请求数",
+                  "# TYPE latexam_requests_in_flight gauge"]
+        for route, count in self.in_flight.items():
+            lines.append(f'latexam_requests_in_flight{{{worker},route="{route}"}} {count}')
+        lines += ["# HELP latexam_sheets_received_total 收到的答题卡数",
+                  "# TYPE latexam_sheets_received_total counter",
+                  f"latexam_sheets_received_total{{{worker}}} {self.sheets_received}",
+                  "# HELP latexam_scores_finalized_total 批改完成的成绩数",
+                  "# TYPE latexam_scores_finalized_total counter",
+                  f"latexam_scores_finalized_total{{{worker}}} {self.scores_finalized}",
+                  "# HELP latexam_grading_duration_seconds 单份答题卡客观题批改耗时",
+                  "# TYPE latexam_grading_duration_seconds histogram"]
+        lines += self.grading.render("latexam_grading_duration_seconds", f"{worker},")
+        lines += ["# HELP latexam_token_cache_hits_total cookie与密码校验缓存命中次数",
+                  "# TYPE latexam_token_cache_hits_total counter"]
+        lines += [f'latexam_token_cache_hits_total{{{worker},cache="{name}"}} {cache.hits}'
+                  for name, cache in caches.items()]
+        lines += ["# HELP latexam_token_cache_misses_total cookie与密码校验缓存未命中次数",
+                  "# TYPE latexam_token_cache_misses_total counter"]
+        lines += [f'latexam_token_cache_misses_total{{{worker},cache="{name}"}} {cache.misses}'
+                  for name, cache in caches.items()]
+        lines += ["# HELP latexam_token_cache_hit_ratio cookie与密码校验缓存命中率",
+                  "# TYPE latexam_token_cache_hit_ratio gauge"]
+        lines += [f'latexam_token_cache_hit_ratio{{{worker},cache="{name}"}} {cache.stats()["hit_rate"]}'
+                  for name, cache in caches.items()]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    统计ROUTES中各接口请求数、耗时和并发数的ASGI中间件，其余请求直接放行
+    """
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        # 带路径参数的接口（如get_exam_chunk/<哈希>）按去掉最后一段的路径统计
+        if scope["type"] != "http" or (route := ROUTES.get(scope["path"])
+                                       or ROUTES.get(scope["path"].rpartition("/")[0])) is None:
+            await self.app(scope, receive, send)
+            return
+        metrics = self.metrics
+        status = 500  # 未发出响应就抛出异常时按500计
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight[route] += 1
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.latency[route].observe(perf_counter() - start)
+            metrics.in_flight[route] -= 1
+            statuses = metrics.requests[route]
+            statuses[status] = statuses.get(status, 0) + 1
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+import asyncio
+import os
+
+from Core.Tools.encryption import is_derived, verify_password
+from Server.core.TokenCache import TokenCache
+
+
+class PasswordVerifier:
+    """
+    登录密码校验
+
+    名单中保存的是导入时派生的PBKDF2哈希，校验需要约10毫秒，放在有界线程池中进行，不阻塞事件循环
+    （hashlib计算时释放GIL）。直接保存sha256摘要的旧名单在事件循环中比较即可。
+    校验成功的结果缓存ttl秒，断线重连的考生无需再次派生。
+    缓存键是名单中的哈希与提交的摘要共同的sha256，名单中的密码改变后旧的缓存自然失效。
+    """
+    def __init__(self, workers: int | None = None, ttl: float = 600.0, maxsize: int = 8192):
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1),
+                                           thread_name_prefix="LatexamKDF")
+        self.verified: TokenCache = TokenCache(maxsize, ttl)  # 校验成功的（名单哈希，提交的摘要）
+
+    async def verify(self, stored: str, password: str) -> bool:
+        """
+        校验客户端提交的密码摘要
+        :param stored: 名单中保存的密码
+        :param password: 客户端提交的密码摘要
+        :return: 密码正确时返回True
+        """
+        if not is_derived(stored):
+            return verify_password(stored, password)
+        key = self._key(stored, password)
+        if self.verified.get(key) is not None:
+            return True
+        if not await asyncio.get_running_loop().run_in_executor(self.executor, verify_password, stored, password):
+            return False
+        self.verified.put(key, True)
+        return True
+
+    @staticmethod
+    def _key(stored: str, password: str) -> str:
+        return sha256(f"{stored}\n{password.lower()}".encode("utf-8")).hexdigest()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,106 @@
+from hashlib import sha256
+from typing import NamedTuple
+
+from fastapi.responses import Response
+
+from Core.models import Results, Exam, PaperManifest
+
+CHUNK_SIZE = 64 * 1024  # 分块下载考试信息时每块的字节数
+
+
+class CachedResponse(NamedTuple):
+    """
+    预先序列化的JSON响应，附带强ETag，支持If-None-Match条件请求
+    """
+    body: bytes
+    etag: str
+
+    @classmethod
+    def encode(cls, results: Results) -> "CachedResponse":
+        body = results.json().encode("utf-8")
+        return cls(body=body, etag=f'"{sha256(body).hexdigest()[:32]}"')
+
+    def respond(self, if_none_match: str | None = None) -> Response:
+        """
+        生成响应，客户端缓存仍然有效时返回304
+        :param if_none_match: 请求头If-None-Match的值
+        :return: 响应
+        """
+        if matches(self.etag, if_none_match):
+            return Response(status_code=304, headers={"ETag": self.etag})
+        return Response(content=self.body, media_type="application/json", headers={"ETag": self.etag})
+
+
+def matches(etag: str, if_none_match: str | None) -> bool:
+    return if_none_match is not None and \
+        (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")))
+
+
+class ChunkedBody(NamedTuple):
+    """
+    切分为定长块的响应体，供网络不稳定的客户端并行、断点续传地下载，每块可按sha256校验
+    """
+    body: bytes
+    chunk_size: int
+    hashes: tuple[str, ...]  # 各块的sha256
+
+    @classmethod
+    def split(cls, body: bytes, chunk_size: int = CHUNK_SIZE) -> "ChunkedBody":
+        view = memoryview(body)
+        hashes = tuple(sha256(view[start:start + chunk_size]).hexdigest()
+                       for start in range(0, len(body), chunk_size))
+        return cls(body=body, chunk_size=chunk_size, hashes=hashes)
+
+    def manifest(self) -> PaperManifest:
+        return PaperManifest(digest=sha256(self.body).hexdigest(), size=len(self.body),
+                             chunk_size=self.chunk_size, chunks=list(self.hashes))
+
+    def find(self, digest: str) -> int | None:
+        """
+        按哈希查找块
+        :param digest: 块的sha256
+        :return: 块序号，当前版本中没有该块时返回None
+        """
+        try:
+            return self.hashes.index(digest)
+        except ValueError:
+            return None
+
+    def respond(self, index: int, if_none_match: str | None = None, immutable: bool = False) -> Response | None:
+        """
+        生成一块的响应，客户端已有时返回304
+        :param index: 块序号（从0开始）
+        :param if_none_match: 请求头If-None-Match的值
+        :param immutable: URL是否按内容哈希寻址；只有这样的URL才能永久缓存，按序号寻址的块在考试修改后会变化
+        :return: 响应，序号不存在时返回None
+        """
+        if not 0 <= index < len(self.hashes):
+            return None
+        etag = f'"{self.hashes[index]}"'
+        if matches(etag, if_none_match):
+            return Response(status_code=304, headers={"ETag": etag})
+        start = index * self.chunk_size
+        cache_control = "private, max-age=31536000, immutable" if immutable else "no-cache"
+        return Response(content=self.body[start:start + self.chunk_size], media_type="application/octet-stream",
+                        headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+class ExamResponses(NamedTuple):
+    """
+    一场考试的所有考试级响应，设定考试时整体替换，保证各响应对应同一版本
+    """
+    student_exam: CachedResponse  # 考生版考试信息
+    exam_detail: CachedResponse  # 管理端完整考试信息
+    paper_chunks: ChunkedBody  # 分块的考生版考试信息
+    paper_manifest: CachedResponse  # paper_chunks的清单
+
+    @classmethod
+    def build(cls, exam: Exam) -> "ExamResponses":
+        student_exam = CachedResponse.encode(Results(msg="查询成功！", data=exam.to_student_exam()))
+        paper_chunks = ChunkedBody.split(student_exam.body)
+        return cls(
+            student_exam=student_exam,
+            exam_detail=CachedResponse.encode(Results(msg="查询成功！", data=exam)),
+            paper_chunks=paper_chunks,
+            paper_manifest=CachedResponse.encode(Results(msg="查询成功！", data=paper_chunks.manifest()))
+        )
@@ -0,0 +1,107 @@
+from typing import Iterator
+
+from Core.models import AnswerSheet
+
+
+class ResultStore:
+    """
+    以考生uid为键的答题卡与成绩存储，查询、查重均为O(1)，遍历时保持提交顺序
+    """
+    def __init__(self):
+        self.sheets: dict[str, AnswerSheet] = {}
+        self.scores: dict[str, tuple[int, bool]] = {}  # uid为key，分数和是否主观题阅卷为value
+        self.marks: dict[str, dict[int, int]] = {}  # uid为key，按题批改时各主观题的得分为value
+        self.uids: list[str] = []  # 按提交顺序排列的uid，用于分页
+        self.drafts: dict[str, list[str]] = {}  # uid为key，考试期间逐题自动保存、尚未交卷的作答为value
+
+    def __len__(self) -> int:
+        return len(self.sheets)
+
+    def has_sheet(self, uid: str) -> bool:
+        return uid in self.sheets
+
+    def add_sheet(self, sheet: AnswerSheet) -> bool:
+        """
+        加入一份答题卡
+        :param sheet: 答题卡
+        :return: 成功加入返回True，该考生已提交过则返回False
+        """
+        uid = sheet.student.uid
+        if uid in self.sheets:
+            return False
+        self.sheets[uid] = sheet
+        self.uids.append(uid)
+        self.drafts.pop(uid, None)
+        return True
+
+    def remove_sheet(self, uid: str, draft: list[str] | None = None) -> None:
+        """
+        撤销一份刚加入的答题卡，用于持久化失败时恢复原状
+        :param uid: 考生uid
+        :param draft: 加入答题卡前该考生未交卷的作答，为None时不恢复
+        :return: 无
+        """
+        if self.sheets.pop(uid, None) is None:
+            return
+        self.uids.remove(uid)
+        if draft is not None:
+            self.drafts[uid] = draft
+
+    def remove_score(self, uid: str) -> None:
+        self.scores.pop(uid, None)
+
+    def get_sheet(self, uid: str) -> AnswerSheet | None:
+        return self.sheets.get(uid)
+
+    def iter_sheets(self) -> Iterator[AnswerSheet]:
+        return iter(self.sheets.values())
+
+    def page_sheets(self, offset: int, limit: int) -> list[AnswerSheet]:
+        return [self.sheets[uid] for uid in self.uids[offset:offset + limit]]
+
+    def get_draft(self, uid: str) -> list[str] | None:
+        return self.drafts.get(uid)
+
+    def patch_draft(self, uid: str, answers: dict[int, str], length: int) -> None:
+        """
+        更新某考生未交卷的作答
+        :param uid: 考生uid
+        :param answers: 题号为key、作答为value的更新
+        :param length: 试卷题目数
+        :return: 无
+        """
+        draft = self.drafts.setdefault(uid, [])
+        if len(draft) < length:  # 考试更新后题目可能变多
+            draft.extend([""] * (length - len(draft)))
+        for index, answer in answers.items():
+            draft[index] = answer
+
+    def has_score(self, uid: str) -> bool:
+        return uid in self.scores
+
+    def get_score(self, uid: str) -> tuple[int, bool] | None:
+        return self.scores.get(uid)
+
+    def set_score(self, uid: str, score: int, marked: bool) -> None:
+        self.scores[uid] = (score, marked)
+
+    def iter_scores(self) -> Iterator[tuple[str, tuple[int, bool]]]:
+        return iter(self.scores.items())
+
+    def get_marks(self, uid: str) -> dict[int, int]:
+        return self.marks.get(uid, {})
+
+    def set_mark(self, uid: str, index: int, score: int) -> int:
+        """
+        设定某考生某道主观题的得分，并将差值计入总分
+        :param uid: 考生uid
+        :param index: 题号（从0开始）
+        :param score: 本题得分
+        :return: 更新后的总分
+        """
+        marks = self.marks.setdefault(uid, {})
+        total, marked = self.scores.get(uid, (0, False))
+        total += score - marks.get(index, 0)
+        marks[index] = score
+        self.scores[uid] = (total, marked)
+        return total
@@ -0,0 +1,30 @@
+from Core.models import Student
+
+
+class Roster:
+    """
+    考试人员名单的内存索引，以uid为键，设定考试时由student_list生成
+
+    名单同时决定谁可以参加考试：不在名单中的账号无法登录，也无法通过考生验证。
+    名单为空的考试对考生库中的所有考生开放，见StudentDirectory。
+    密码的校验见PasswordVerifier。
+    """
+    def __init__(self, students: list[Student] | None = None):
+        self.entries: dict[str, Student] = {}
+        for student in students or []:
+            self.add(student)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self.entries
+
+    def add(self, student: Student) -> None:
+        self.entries[student.uid] = student
+
+    def remove(self, uid: str) -> bool:
+        return self.entries.pop(uid, None) is not None
+
+    def get(self, uid: str) -> Student | None:
+        return self.entries.get(uid)
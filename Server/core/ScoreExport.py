@@ -0,0 +1,90 @@
+import csv
+import io
+from typing import Iterator
+
+from Server.core.AnswerKey import AnswerKey
+from Server.core.ResultStore import ResultStore
+from Server.core.Roster import Roster
+
+CSV_BATCH = 500  # 导出CSV时每次发送的行数
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+
+class ScoreExport:
+    """
+    全部考生成绩的逐行导出，包含总分与每题得分
+
+    客观题得分按答案表由答题卡现算，主观题得分取按题批改的结果，尚未批改的留空。
+    开始导出时只复制考生uid列表，各行在遍历时才生成，不在内存中构建整张表。
+    """
+    def __init__(self, answer_key: AnswerKey, results: ResultStore, roster: Roster):
+        self.answer_key: AnswerKey = answer_key
+        self.results: ResultStore = results
+        self.roster: Roster = roster
+        # 先按提交顺序列出交过卷的考生，再列出只有成绩（由管理端直接设定）的考生
+        self.uids: list[str] = list(results.uids) + [uid for uid, _ in list(results.iter_scores())
+                                                      if not results.has_sheet(uid)]
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    def header(self) -> list[str]:
+        return ["学号", "姓名", "总分", "阅卷完成"] + \
+            [f"第{index + 1}题" for index in range(len(self.answer_key.types))]
+
+    def rows(self) -> Iterator[list]:
+        answer_key = self.answer_key
+        for uid in self.uids:
+            sheet = self.results.get_sheet(uid)
+            if (student := self.roster.get(uid)) is not None:
+                nickname = student.nickname
+            else:
+                nickname = sheet.student.nickname if sheet is not None else ""
+            total, marked = self.results.get_score(uid) or ("", False)
+            questions: list = [""] * len(answer_key.types)
+            if sheet is not None:
+                answers = sheet.answers
+                for index, answer, score in answer_key.objective:
+                    questions[index] = score if index < len(answers) and answers[index] == answer else 0
+                for index, score in list(self.results.get_marks(uid).items()):  # 导出XLSX时在线程中遍历
+                    if index < len(questions):
+                        questions[index] = score
+            yield [uid, nickname, total, "是" if marked else "否", *questions]
+
+    def iter_csv(self) -> Iterator[bytes]:
+        """
+        逐批生成CSV，首块带BOM以便Excel正确识别UTF-8
+        :return: CSV内容的字节块
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.header())
+        prefix = "\ufeff"
+        count = 0
+        for row in self.rows():
+            writer.writerow(row)
+            count += 1
+            if count % CSV_BATCH == 0:
+                yield (prefix + buffer.getvalue()).encode("utf-8")
+                prefix = ""
+                buffer.seek(0)
+                buffer.truncate()
+        yield (prefix + buffer.getvalue()).encode("utf-8")
+
+    def write_xlsx(self, file) -> None:
+        """
+        以只写模式生成XLSX，行数据由openpyxl暂存在临时文件中，耗时较长，应在线程中调用
+        :param file: 可写的二进制文件对象
+        :return: 无
+        """
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("成绩")
+        worksheet.append(self.header())
+        for row in self.rows():
+            worksheet.append(row)
+        workbook.save(file)
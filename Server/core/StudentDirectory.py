@@ -0,0 +1,95 @@
+from pathlib import Path
+from typing import NamedTuple
+from hashlib import sha256
+import re
+
+from aiosqlite import connect, Connection
+
+from Server.SQLScript import SQLCommand
+from Core.models import Student
+from Core.Tools.encryption import is_derived
+
+BATCH_SIZE = 5000  # 每次executemany的行数
+DEFER_INDEX_ROWS = 10000  # 插入不少于该行数时先删除二级索引，插入完成后再重建
+DIGEST_PATTERN = re.compile(r"[0-9a-fA-F]{64}")
+
+
+class RosterDiff(NamedTuple):
+    """
+    批量导入考生库的结果
+    """
+    inserted: int
+    updated: int
+    unchanged: int
+    deleted: int
+
+
+class StudentDirectory:
+    """
+    Student.db中Student表（考生库）的批量维护
+
+    考试人员名单（student_list）为空的考试对考生库中的所有考生开放，登录时按uid在考生库中查找，见get。
+    导入时先读出现有的全部行与新名单比较，只写入新增、变化和（replace时）删除的行，
+    全部写入在一个事务中完成，中途失败时考生库保持原样。
+    """
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self.conn: Connection | None = None  # 登录查询用的连接，首次查询时打开
+
+    async def get(self, uid: str) -> Student | None:
+        """
+        按uid查找考生
+        :param uid: 考生uid
+        :return: 考生，密码为导入时保存的哈希；不存在时返回None
+        """
+        if self.conn is None:
+            self.conn = await connect(self.path.resolve())
+        if not (rows := await self.conn.execute_fetchall(SQLCommand.GetStudentInfo, {"uid": uid})):
+            return None
+        uid, nickname, password = rows[0]
+        if not is_derived(password) and not DIGEST_PATTERN.fullmatch(password):
+            password = sha256(password.encode("utf-8")).hexdigest()  # 早期版本的考生库直接保存明文密码，按摘要比较
+        return Student(uid=uid, nickname=nickname, password=password)
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def upsert(self, students: list[Student], replace: bool = False) -> RosterDiff:
+        """
+        批量导入考生
+        :param students: 考生名单，uid重复时以后出现的为准
+        :param replace: 为True时删除考生库中不在名单里的考生
+        :return: 各类变化的行数
+        """
+        incoming = {student.uid: (student.nickname, student.password) for student in students}
+        conn = await connect(self.path.resolve())
+        try:
+            await conn.execute("PRAGMA busy_timeout=5000")  # 与日志的组提交共用数据库文件
+            await conn.execute("BEGIN IMMEDIATE")
+            async with conn.execute(SQLCommand.GetStudents) as cursor:
+                existing = {uid: (nickname, password) for uid, nickname, password in await cursor.fetchall()}
+            inserts = [{"uid": uid, "nickname": nickname, "password": password}
+                       for uid, (nickname, password) in incoming.items() if uid not in existing]
+            updates = [{"uid": uid, "nickname": nickname, "password": password}
+                       for uid, (nickname, password) in incoming.items()
+                       if uid in existing and existing[uid] != (nickname, password)]
+            deletes = [{"uid": uid} for uid in existing if uid not in incoming] if replace else []
+            defer_index = len(inserts) >= DEFER_INDEX_ROWS
+            if defer_index:
+                await conn.execute(SQLCommand.DropStudentIndex)
+            for sql, rows in ((SQLCommand.DeleteStudent, deletes), (SQLCommand.UpdateStudent, updates),
+                              (SQLCommand.InsertStudent, inserts)):
+                for start in range(0, len(rows), BATCH_SIZE):
+                    await conn.executemany(sql, rows[start:start + BATCH_SIZE])
+            if defer_index:
+                await conn.execute(SQLCommand.CreateStudentIndex)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        finally:
+            await conn.close()
+        return RosterDiff(inserted=len(inserts), updated=len(updates),
+                          unchanged=len(incoming) - len(inserts) - len(updates), deleted=len(deletes))
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any
+
+
+class TokenCache:
+    """
+    已验证cookie的LRU缓存，以原始cookie字符串为键，命中时跳过解码、解析和哈希校验
+
+    设定ttl时每项在放入ttl秒后过期。
+    """
+    def __init__(self, maxsize: int = 8192, ttl: float | None = None):
+        self.maxsize: int = maxsize
+        self.ttl: float | None = ttl  # 有效期，单位秒，为None时不过期
+        self.tokens: OrderedDict[str, Any] = OrderedDict()
+        self.expires: dict[str, float] = {}  # 设定ttl时各项的过期时间
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def get(self, token: str) -> Any | None:
+        if (value := self.tokens.get(token)) is None or \
+                (self.ttl is not None and self.expires[token] <= monotonic()):
+            if value is not None:
+                del self.tokens[token], self.expires[token]
+            self.misses += 1
+            return None
+        self.tokens.move_to_end(token)
+        self.hits += 1
+        return value
+
+    def put(self, token: str, value: Any) -> None:
+        self.tokens[token] = value
+        self.tokens.move_to_end(token)
+        if self.ttl is not None:
+            self.expires[token] = monotonic() + self.ttl
+        if len(self.tokens) > self.maxsize:
+            self.expires.pop(self.tokens.popitem(last=False)[0], None)
+
+    def clear(self) -> None:
+        self.tokens.clear()
+        self.expires.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.tokens),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -1,10 +1,26 @@
-from Server.apps import api
+from argparse import ArgumentParser
+import sys
+
 from Server.core.LatexamServer import LatexamServer
 
 
+if __name__ != "Server.main":
+    # 以脚本方式运行（包括多进程模式下子进程重新执行主模块）时，让路由模块导入的Server.main就是本模块，避免创建第二个服务器实例
+    sys.modules.setdefault("Server.main", sys.modules[__name__])
+
 server = LatexamServer()
 
+from Server.apps import api, metrics_api  # 路由模块需要导入server，因此在其创建之后导入
+
+server.app.include_router(api)
+server.app.include_router(metrics_api)
+app = server.app  # 多进程模式下各工作进程通过"Server.main:app"导入
+
 
 if __name__ == "__main__":
-    server.app.include_router(api)
-    server.run()
+    parser = ArgumentParser(description="Latexam 考试系统服务端")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=8080, help="监听端口")
+    parser.add_argument("--workers", type=int, default=1, help="工作进程数")
+    args = parser.parse_args()
+    server.run(args.host, args.port, args.workers)
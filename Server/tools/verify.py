@@ -8,6 +8,10 @@ from Core.models import Student, Exam, StudentToken, AdminToken
 from Server.main import server
 
 
+async def sync_shared_state():
+    await server.sync()
+
+
 def verify_exam_status():
     if server.exam is None:
         raise HTTPException(status_code=403, detail="考试未设定")
@@ -15,6 +19,8 @@ def verify_exam_status():
 
 
 def verify_student(token: str = Cookie(...), exam: Exam = Depends(verify_exam_status)) -> Student:
+    if (student := server.student_tokens.get(token)) is not None:
+        return student
     data = b64decode(token).decode("utf-8")
     data = StudentToken.parse_raw(data)
     student = data.student
@@ -22,14 +28,20 @@ def verify_student(token: str = Cookie(...), exam: Exam = Depends(verify_exam_st
         raise HTTPException(status_code=401, detail="登录已失效")
     if student.uid == 0:
         raise HTTPException(status_code=401, detail="不能为管理账号")
+    if exam.student_list and student.uid not in server.roster:  # 名单为空的考试对考生库开放
+        raise HTTPException(status_code=401, detail="不在考试人员名单中")
+    server.student_tokens.put(token, student)
     return student
 
 
 def verify_admin(token: str = Cookie(...)) -> bool:
+    if server.admin_tokens.get(token) is not None:
+        return True
     data = b64decode(token).decode("utf-8")
     data = AdminToken.parse_raw(data)
     if not compare_digest(sha256(f"{server.admin_password}{server.salt}".encode("utf-8")).hexdigest(), data.token):
         raise HTTPException(status_code=401, detail="cookie无效")
+    server.admin_tokens.put(token, True)
     return True
 
 
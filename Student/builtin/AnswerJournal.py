@@ -0,0 +1,110 @@
+import os
+import threading
+
+import ujson as json
+
+from Core.models import AnswerSheet
+
+
+class AnswerJournal:
+    """
+    考生客户端的本地作答日志
+
+    每次作答都以一行JSON追加到日志文件（papers/<学号>.lej）并立即落盘，写入量只与修改的题目有关。
+    定期压缩时把完整答题卡原子地写入快照文件（papers/<学号>.les），再清空日志。
+    日志第一行记录考试uuid，重启后只恢复同一场考试的作答；崩溃时写了一半的最后一行会被忽略。
+    """
+    def __init__(self, directory: str, number: str, exam_id: str):
+        self.snapshot_path: str = os.path.join(directory, f"{number}.les")
+        self.journal_path: str = os.path.join(directory, f"{number}.lej")
+        self.exam_id: str = exam_id
+        self.records: int = 0  # 上次压缩后追加的记录数
+        self.lock = threading.Lock()  # 作答在界面线程追加，压缩在计时线程进行
+        self.file = None
+
+    def recover(self, sheet: AnswerSheet) -> int:
+        """
+        用快照和日志恢复同一场考试的作答，并打开日志准备追加
+        :param sheet: 新建的空白答题卡，恢复的作答直接写入其中
+        :return: 恢复的非空作答数
+        """
+        length = len(sheet.answers)
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                    snapshot = AnswerSheet.parse_raw(file.read())
+                if snapshot.exam_id == self.exam_id:
+                    sheet.answers[:] = (snapshot.answers + [""] * length)[:length]
+            except ValueError:
+                pass  # 旧版本直接覆写的快照可能已损坏，以日志为准
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as file:
+                lines = file.read().split("\n")
+            try:
+                header = json.loads(lines[0])
+            except ValueError:
+                header = {}
+            if header.get("exam_id") == self.exam_id:
+                for line in lines[1:]:
+                    try:
+                        index, answer = json.loads(line)
+                    except ValueError:
+                        break  # 最后一行可能只写了一半
+                    if 0 <= index < length:
+                        sheet.answers[index] = answer
+                        self.records += 1
+        if self.records:
+            self.compact(sheet)  # 恢复的作答写入快照，同时去掉可能只写了一半的最后一行
+        else:
+            with self.lock:
+                self._reset()
+        return sum(1 for answer in sheet.answers if answer)
+
+    def append(self, index: int, answer: str) -> None:
+        """
+        追加一条作答记录并落盘
+        :param index: 题号（从0开始）
+        :param answer: 作答
+        :return: 无
+        """
+        with self.lock:
+            self.file.write(json.dumps([index, answer], ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.records += 1
+
+    def compact(self, sheet: AnswerSheet, force: bool = False) -> None:
+        """
+        将完整答题卡原子地写入快照并清空日志
+        :param sheet: 当前答题卡
+        :param force: 为False时，日志为空则不做任何事
+        :return: 无
+        """
+        with self.lock:
+            if self.records == 0 and not force:
+                return
+            self._write_atomic(self.snapshot_path, sheet.json())
+            self._reset()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _reset(self) -> None:
+        # 快照落盘之后才替换日志，两步之间崩溃时日志中的记录会被重放一次，结果不变
+        if self.file is not None:
+            self.file.close()
+        self._write_atomic(self.journal_path, json.dumps({"exam_id": self.exam_id}) + "\n")
+        self.file = open(self.journal_path, "a", encoding="utf-8")
+        self.records = 0
+
+    @staticmethod
+    def _write_atomic(path: str, content: str) -> None:
+        temp = path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, path)
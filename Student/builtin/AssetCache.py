@@ -0,0 +1,74 @@
+import asyncio
+import os
+import re
+from hashlib import sha256
+from pathlib import Path
+
+import httpx
+
+# 试卷中以asset:<sha256>引用资源文件
+ASSET_PATTERN = re.compile(r"asset:([0-9a-f]{64})")
+
+
+class AssetCache:
+    """
+    以内容哈希为文件名的本地资源缓存（papers/assets/）
+
+    资源内容不会改变，已缓存的文件无需再次下载；下载完成并校验哈希后才放入缓存，不会留下损坏的文件。
+    """
+    def __init__(self, directory: str):
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    async def fetch(self, client: httpx.AsyncClient, address: str, digest: str) -> bool:
+        """
+        下载一个资源到缓存，已缓存时不发出请求
+        :param client: 网络线程的客户端
+        :param address: 服务器地址
+        :param digest: 资源的sha256
+        :return: 缓存中有该资源时返回True
+        """
+        if self.has(digest):
+            return True
+        temp = self.path(digest) + ".tmp"
+        hasher = sha256()
+        async with client.stream("GET", f"{address}/api/v1/assets/{digest}") as response:
+            if response.status_code != 200:
+                return False
+            with open(temp, "wb") as file:
+                async for chunk in response.aiter_bytes():
+                    hasher.update(chunk)
+                    file.write(chunk)
+        if hasher.hexdigest() != digest:
+            os.remove(temp)
+            return False
+        os.replace(temp, self.path(digest))
+        return True
+
+    async def prefetch(self, client: httpx.AsyncClient, address: str, texts: list[str]) -> int:
+        """
+        下载文本中引用的所有尚未缓存的资源
+        :param client: 网络线程的客户端
+        :param address: 服务器地址
+        :param texts: 题干、选项等文本
+        :return: 缓存中已有的资源数
+        """
+        digests = {digest for text in texts for digest in ASSET_PATTERN.findall(text)}
+        results = await asyncio.gather(*[self.fetch(client, address, digest) for digest in digests],
+                                       return_exceptions=True)
+        return sum(1 for result in results if result is True)
+
+    def render(self, html: str) -> str:
+        """
+        将文本中的资源引用替换为本地文件地址，尚未缓存的引用保持不变
+        :param html: 文本
+        :return: 替换后的文本
+        """
+        return ASSET_PATTERN.sub(lambda match: Path(self.path(match.group(1))).resolve().as_uri()
+                                 if self.has(match.group(1)) else match.group(0), html)
@@ -5,10 +5,13 @@ import socket
 import hashlib
 import httpx
 import time
+import random
 import datetime
 from tzlocal import get_localzone
 from datetime import timezone
 import threading
+import asyncio
+from concurrent.futures import Future
 
 from PySide6.QtCore import Signal, QObject
 
@@ -26,12 +29,21 @@ from PySide6.QtGui import QAction
 from .AboutWindow import Ui_AboutWindow
 from .LatexamWindow import Ui_LatexamWindow
 from .LoginDialog import Ui_LoginWindow
+from .AnswerJournal import AnswerJournal
+from .AssetCache import AssetCache
+from .PaperDownloader import PaperDownloader
 
 from Core.models import *
+from Core.Tools import NetworkWorker
 
 VERSION = "v1.0.0 Alpha"
 local_timezone = get_localzone()
 
+SUBMIT_JITTER = 10  # 考试结束后随机等待的最长时间，单位秒，错开所有考生同时交卷
+SUBMIT_RETRIES = 6  # 交卷最多尝试的次数
+SUBMIT_BACKOFF = 1  # 重试的基础等待时间，单位秒，每次翻倍
+SUBMIT_BACKOFF_MAX = 30  # 重试等待时间的上限，单位秒
+
 
 class LatexamSignal(QObject):
     set_input_box = Signal(str)
@@ -40,6 +52,7 @@ class LatexamSignal(QObject):
     append_output_box = Signal(str)
     clear_output_box = Signal()
     send_dialog = Signal(str)
+    network_done = Signal(object, object, object)  # 回调、结果、异常，网络请求完成后在界面线程调用回调
 
 
 class LatexamApplication(QMainWindow):
@@ -49,18 +62,24 @@ class LatexamApplication(QMainWindow):
     end_timer: threading.Timer
     time_thread: threading.Thread
 
-    client: httpx.Client
+    network: NetworkWorker
     address: str = ""
     username: str = ""
     number: str = ""
     password: str = ""
     online: bool = False
 
-    paper: Paper
-    exam: Exam
+    paper: StudentPaper
+    exam: StudentExam
+    assets: AssetCache  # 试卷资源文件缓存
+    downloader: PaperDownloader  # 分块下载考试信息
     sheet: AnswerSheet
 
     index: int = -1
+    journal: AnswerJournal | None = None  # 本地作答日志
+    pending: dict[int, str]  # 已作答但尚未自动保存到服务器的题目
+    pending_lock: threading.Lock  # pending由GUI线程写入、网络线程删除
+    autosave_lock: asyncio.Lock
 
     def __init__(self):
         super().__init__()
@@ -79,6 +98,13 @@ class LatexamApplication(QMainWindow):
         if not os.path.exists("papers/"):
             os.mkdir("papers")
 
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.autosave_lock = asyncio.Lock()
+        self.network = NetworkWorker()
+        self.assets = AssetCache(os.path.join("papers", "assets"))
+        self.downloader = PaperDownloader(os.path.join("papers", "chunks"))
+
         self.time_thread = threading.Thread(target=self.threadTime)
         self.time_thread.start()
 
@@ -89,12 +115,15 @@ class LatexamApplication(QMainWindow):
         self.signal.append_output_box.connect(self.ui.output_message.append)
         self.signal.clear_output_box.connect(self.ui.output_message.clear)
         self.signal.send_dialog.connect(self.sendDialog)
+        self.signal.network_done.connect(lambda callback, result, error: callback(result, error))
 
     def closeEvent(self, event) -> None:
         dialog = QMessageBox.warning(self, "Latexam - 警告", "你真的要退出Latexam考试系统吗？\n"
                                                              "所有未保存更改都会消失！",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if dialog == QMessageBox.Yes:
+            self.network.close()
+            self.closeJournal()
             event.accept()
             self.deleteLater()
         else:
@@ -114,25 +143,51 @@ class LatexamApplication(QMainWindow):
                 self.child_window = AboutApplication()
                 self.child_window.show()
 
-    def onConnect(self) -> bool:
+    def request(self, function, callback) -> Future:
+        """
+        在网络线程中执行请求，完成后在界面线程调用callback(结果, 异常)
+        :param function: 以httpx.AsyncClient为参数的协程函数
+        :param callback: 回调函数
+        :return: 可用于取消请求的Future
+        """
+        return self.network.submit(function, lambda result, error: self.signal.network_done.emit(callback, result, error))
+
+    def onConnect(self) -> None:
+        """
+        在网络线程中执行登录操作，完成后由onConnected处理结果
+        :return: 无
+        """
+        self.setWindowTitle(f"Latexam 考试系统 {VERSION} - 正在连接")
+        login = LoginData(uid=self.number, password=self.password)
+
+        async def connect(client: httpx.AsyncClient) -> tuple[httpx.Response, StudentExam | None]:
+            request = await client.post(f"{self.address}/api/v1/login", json=login.dict())
+            if request.status_code != 200 or not request.json()["success"]:
+                return request, None
+            # 分块下载考试信息，网络中断后重新连接时只下载缺少的块
+            if (body := await self.downloader.download(client, self.address)) is None:
+                body = (await client.get(f"{self.address}/api/v1/get_exam_info")).content
+            return request, StudentExam.parse_obj(Results.parse_raw(body).data)
+
+        self.request(connect, self.onConnected)
+
+    def onConnected(self, result: tuple[httpx.Response, StudentExam | None] | None, error: BaseException | None) -> None:
         """
-        执行登录操作，返回是否成功
-        :return: 成功返回True，否则返回False
+        处理登录结果
+        :param result: 登录响应与考试信息
+        :param error: 网络异常
+        :return: 无
         """
-        self.client = httpx.Client()
-        request = self.client.post(f"{self.address}/api/v1/login",
-                                       json=LoginData(uid=self.number, password=self.password)
-                                       .dict())
+        if error is not None:
+            QMessageBox.warning(self, "Latexam - 警告", f"无法连接到Latexam服务器。\n错误信息：{error}")
+            self.setOffline()
+            return
+        request, exam = result
         if request.status_code == 403:
             QMessageBox.warning(self, "Latexam - 警告", f"无法连接到Latexam服务器。\n"
                                                         f"服务器报告的信息：{request.json()['detail']}")
-            self.setWindowTitle(f"Latexam 考试系统 {VERSION} - 离线")
-            self.online = False
-            self.address = ""
-            self.username = ""
-            self.number = ""
-            self.password = ""
-            return False
+            self.setOffline()
+            return
 
         response = LoginResults.parse_obj(request.json())
         if response.success:
@@ -147,15 +202,10 @@ class LatexamApplication(QMainWindow):
         else:
             QMessageBox.warning(self, "Latexam - 警告", f"无法登录到 Latexam 服务器。\n"
                                                         f"服务器报告的信息：{response.msg}")
-            self.setWindowTitle(f"Latexam 考试系统 {VERSION} - 离线")
-            self.online = False
-            self.address = ""
-            self.username = ""
-            self.number = ""
-            self.password = ""
-            return False
+            self.setOffline()
+            return
 
-        self.exam = Exam.parse_obj(self.client.get(f"{self.address}/api/v1/get_exam_info").json()["data"])
+        self.exam = exam
         self.ui.output_status.topLevelItem(1).addChild(QTreeWidgetItem([f"服务器地址：{self.address}"]))
         self.ui.output_status.topLevelItem(1).addChild(QTreeWidgetItem([f"考生姓名：{self.username}"]))
         self.ui.output_status.topLevelItem(1).addChild(QTreeWidgetItem([f"考生学号：{self.number}"]))
@@ -165,6 +215,9 @@ class LatexamApplication(QMainWindow):
         self.ui.output_status.topLevelItem(1).addChild(
             QTreeWidgetItem([f"考试开始时间：{self.exam.start_time.astimezone(local_timezone)}"]))
         self.paper = self.exam.paper
+        # 在后台下载试卷引用的资源，已缓存的不再下载
+        texts = [text for question in self.paper.questions for text in (question.title, *(option.text for option in question.options))]
+        self.network.submit(lambda client: self.assets.prefetch(client, self.address, texts))
         self.signal.set_output_box.emit(f"<h2>欢迎您，{self.username}！<h2>"
                                         f"<h3>您正在参加 {self.exam.title}。<h3>"
                                         f"<p>试卷标题：{self.paper.title}</p>"
@@ -178,12 +231,29 @@ class LatexamApplication(QMainWindow):
         self.sheet = AnswerSheet(student=Student(uid=self.number, nickname=self.username, password=""),
                                  exam_id=self.exam.uuid,
                                  answers=[""] * len(self.paper.questions))
+        # 从本地日志恢复上次崩溃或重启前的作答，并同步到服务器
+        self.closeJournal()
+        self.journal = AnswerJournal(os.path.join(os.getcwd(), "papers"), self.number, self.exam.uuid)
+        if recovered := self.journal.recover(self.sheet):
+            self.signal.append_output_box.emit(f"<p><font color='blue'>已从本地恢复 {recovered} 道题的作答。</font></p>")
+        with self.pending_lock:
+            self.pending = {index: answer for index, answer in enumerate(self.sheet.answers) if answer}
+        if self.pending:
+            self.network.submit(self.autosave)
         self.ui.output_status.topLevelItem(2).addChild(QTreeWidgetItem([f"试卷标题：{self.paper.title}"]))
         self.start_timer = threading.Timer((self.exam.start_time - datetime.now(tz=timezone.utc)).total_seconds(), self.startExam)
         self.end_timer = threading.Timer((self.exam.end_time - datetime.now(tz=timezone.utc)).total_seconds(), self.endExam)
         self.start_timer.start()
         self.end_timer.start()
 
+    def setOffline(self) -> None:
+        self.setWindowTitle(f"Latexam 考试系统 {VERSION} - 离线")
+        self.online = False
+        self.address = ""
+        self.username = ""
+        self.number = ""
+        self.password = ""
+
     def onDisconnect(self) -> None:
         """
         执行断开操作
@@ -207,6 +277,17 @@ class LatexamApplication(QMainWindow):
             self.ui.input_message.setEnabled(False)
             self.start_timer.cancel()
             self.end_timer.cancel()
+            self.network.cancel()
+            self.closeJournal()
+
+    def closeJournal(self) -> None:
+        """
+        关闭本地作答日志，已写入的作答都已落盘，下次连接同一场考试时可以恢复
+        :return: 无
+        """
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
 
     def onExit(self) -> None:
         self.close()
@@ -256,12 +337,12 @@ class LatexamApplication(QMainWindow):
         """
         if self.paper.questions[self.index].type == "objective":
             self.signal.set_output_box.emit(f"<p>（{self.index + 1}）（本小题{self.paper.questions[self.index].score}分）</p>"
-                                            f"<p>{self.paper.questions[self.index].title}</p>")
+                                            f"<p>{self.assets.render(self.paper.questions[self.index].title)}</p>")
             for option in self.paper.questions[self.index].options:
-                self.signal.append_output_box.emit(f"<p>{option.text}</p>")
+                self.signal.append_output_box.emit(f"<p>{self.assets.render(option.text)}</p>")
         else:
             self.signal.set_output_box.emit(f"<p>（{self.index + 1}）（本小题{self.paper.questions[self.index].score}分）</p>"
-                                            f"<p>{self.paper.questions[self.index].title}</p>")
+                                            f"<p>{self.assets.render(self.paper.questions[self.index].title)}</p>")
         self.signal.set_input_box.emit(self.sheet.answers[self.index])
 
     def onAnswer(self) -> None:
@@ -274,11 +355,40 @@ class LatexamApplication(QMainWindow):
                     return
             # 按字母顺序排选项
             answer = "".join(sorted(answer))
-            self.sheet.answers[self.index] = answer
         else:
-            self.sheet.answers[self.index] = self.ui.input_message.toPlainText()
+            answer = self.ui.input_message.toPlainText()
+        if answer != self.sheet.answers[self.index]:
+            self.sheet.answers[self.index] = answer
+            self.journal.append(self.index, answer)
+            with self.pending_lock:
+                self.pending[self.index] = answer
+            self.network.submit(self.autosave)
         self.onRender()
 
+    async def autosave(self, client: httpx.AsyncClient) -> bool:
+        """
+        将尚未保存的作答逐题上传到服务器，失败的题目留待下次上传，在网络线程中执行
+        :param client: 网络线程的客户端
+        :return: 全部保存成功返回True，否则返回False
+        """
+        async with self.autosave_lock:
+            with self.pending_lock:
+                answers = dict(self.pending)
+            if not answers:
+                return True
+            try:
+                request = await client.patch(f"{self.address}/api/v1/answer",
+                                             content=AnswerPatchData(answers=answers).json())
+                if request.status_code != 200 or request.json()["recode"] != 200:
+                    return False
+            except httpx.HTTPError:
+                return False
+            with self.pending_lock:
+                for index, answer in answers.items():
+                    if self.pending.get(index) == answer:  # 上传期间又修改过的题目仍需再次上传
+                        del self.pending[index]
+                return not self.pending
+
     def sendDialog(self, content: str) -> None:
         QMessageBox.information(self, "Latexam - 提示", content)
 
@@ -304,24 +414,72 @@ class LatexamApplication(QMainWindow):
         self.ui.button_next.setEnabled(False)
         self.ui.button_previous.setEnabled(False)
         self.ui.input_message.setEnabled(False)
-        self.signal.send_dialog.emit("考试结束，请停止答题！\n请按 OK 键以开始上传答题卡。")
-        request = self.client.post(f"{self.address}/api/v1/upload_sheet", content=self.sheet.json())
-        if request.status_code == 200:
-            self.signal.send_dialog.emit(f"考生 {self.sheet.student.uid} 的答题卡上传成功！")
-        else:
-            with open(os.path.join(os.getcwd(), "papers", f"{self.number}.les"), "w+") as file:
-                file.write(self.sheet.json())
-            self.signal.send_dialog.emit(f"答题卡上传失败，服务器返回了错误：{request.json()['detail']}\n"
-                                                     f"请与考场教师取得联系！相关文件已保存在客户端文件夹/papers/{self.number}.les中")
+        self.signal.send_dialog.emit("考试结束，请停止答题！\n答题卡将在数秒内自动上传。")
+        self.request(self.submitSheet, self.onSubmitted)
+
+    async def submitSheet(self, client: httpx.AsyncClient) -> Results:
+        """
+        交卷，在网络线程中执行。先随机等待一段时间，避免所有考生在结束时刻同时请求；
+        失败时按指数增长并随机化的间隔重试，服务器明确拒绝时不再重试
+        :param client: 网络线程的客户端
+        :return: 最后一次尝试的结果，HTTP错误转换为对应状态码的结果
+        """
+        await asyncio.sleep(random.uniform(0, SUBMIT_JITTER))
+        result = Results(recode=0, msg="")
+        for attempt in range(SUBMIT_RETRIES):
+            if attempt:
+                await asyncio.sleep(random.uniform(0, min(SUBMIT_BACKOFF_MAX, SUBMIT_BACKOFF * 2 ** attempt)))
+            try:
+                result = await self.submitOnce(client)
+            except httpx.HTTPError as e:
+                result = Results(recode=0, msg=str(e))
+                continue
+            if result.recode == 200 or (result.recode not in (408, 429) and result.recode < 500):
+                break
+        return result
+
+    async def submitOnce(self, client: httpx.AsyncClient) -> Results:
+        """
+        交卷一次。作答已逐题保存在服务器上时只需提交摘要确认，否则上传完整答题卡。
+        答题卡摘要同时作为幂等键，重复提交相同的答题卡会被服务器视为成功，因此可以放心重试
+        :param client: 网络线程的客户端
+        :return: 服务器返回的结果
+        """
+        digest = self.sheet.digest()
+        if await self.autosave(client):
+            request = await client.post(f"{self.address}/api/v1/finalize_sheet",
+                                        content=FinalizeData(digest=digest).json())
+            if request.status_code == 200 and request.json()["recode"] == 200:
+                return Results.parse_obj(request.json())
+        request = await client.post(f"{self.address}/api/v1/upload_sheet", content=self.sheet.json(),
+                                    headers={"Idempotency-Key": digest})
+        if request.status_code != 200:
+            try:
+                detail = request.json()["detail"]
+            except (ValueError, KeyError, TypeError):
+                detail = request.text
+            if isinstance(detail, list):  # 422的detail是校验错误的列表
+                detail = "；".join(str(item.get("msg", item)) if isinstance(item, dict) else str(item) for item in detail)
+            return Results(recode=request.status_code, msg=str(detail))
+        return Results.parse_obj(request.json())
+
+    def onSubmitted(self, result: Results | None, error: BaseException | None) -> None:
+        if error is None and result.recode == 200:
+            self.sendDialog(f"考生 {self.sheet.student.uid} 的答题卡上传成功！")
+            return
+        if self.journal is not None:
+            self.journal.compact(self.sheet, force=True)
+        self.sendDialog(f"答题卡上传失败，服务器返回了错误：{error or result.msg}\n"
+                        f"请与考场教师取得联系！相关文件已保存在客户端文件夹/papers/{self.number}.les中")
 
     def threadTime(self) -> None:
         # 先sleep到整秒
         time.sleep(time.time() - int(time.time()))
         while 1:
             self.ui.output_status.topLevelItem(0).child(0).setText(0, str(datetime.now().strftime("%H:%M:%S")))
-            if datetime.now().second == 0 and self.online:  # 每分钟保存一次答题卡
-                with open(os.path.join(os.getcwd(), "papers", f"{self.number}.les"), "w+") as file:
-                    file.write(self.sheet.json())
+            journal = self.journal  # 断开连接时界面线程会把journal置为None
+            if datetime.now().second == 0 and self.online and journal is not None:  # 每分钟压缩一次作答日志
+                journal.compact(self.sheet)
             time.sleep(1)
 
     def onStatusClicked(self, item: QTreeWidgetItem) -> None:
@@ -0,0 +1,112 @@
+import asyncio
+import os
+from hashlib import sha256
+
+import httpx
+
+from Core.models import PaperManifest
+
+CHUNK_PARALLEL = 4  # 同时下载的块数
+CHUNK_RETRIES = 5  # 每块最多尝试的次数
+CHUNK_BACKOFF = 0.5  # 重试的基础等待时间，单位秒，每次翻倍
+MANIFEST_RETRIES = 3  # 下载期间考试被修改时最多重新获取清单的次数
+
+
+class ManifestChanged(Exception):
+    """
+    清单中的块在服务器上已不存在，说明下载期间考试被修改，需要重新获取清单
+    """
+
+
+class PaperDownloader:
+    """
+    分块下载考试信息（见服务器的get_exam_manifest与get_exam_chunk）
+
+    每块下载后按清单中的sha256校验，校验通过才以哈希为文件名存入papers/chunks/。
+    连接中断后重新下载时已有的块直接复用，考试信息更新时内容未变的块也无需再次下载。
+    """
+    def __init__(self, directory: str):
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    async def fetch_chunk(self, client: httpx.AsyncClient, address: str, index: int, digest: str) -> None:
+        """
+        按哈希下载并校验一块，失败时按指数退避重试
+        :param client: 网络线程的客户端
+        :param address: 服务器地址
+        :param index: 块序号
+        :param digest: 该块的sha256
+        :return: 无
+        :raise ManifestChanged: 服务器上已没有该块
+        """
+        if os.path.exists(self.path(digest)):
+            return
+        for attempt in range(CHUNK_RETRIES):
+            try:
+                response = await client.get(f"{address}/api/v1/get_exam_chunk/{digest}")
+                if response.status_code == 404:
+                    raise ManifestChanged(digest)
+                if response.status_code == 200 and sha256(response.content).hexdigest() == digest:
+                    temp = self.path(digest) + ".tmp"
+                    with open(temp, "wb") as file:
+                        file.write(response.content)
+                    os.replace(temp, self.path(digest))
+                    return
+            except httpx.TransportError:
+                if attempt == CHUNK_RETRIES - 1:
+                    raise
+            await asyncio.sleep(CHUNK_BACKOFF * 2 ** attempt)
+        raise ValueError(f"试卷第 {index + 1} 块下载失败或校验不通过")
+
+    async def download(self, client: httpx.AsyncClient, address: str) -> bytes | None:
+        """
+        按清单并行下载所有块，拼接后校验完整内容；下载期间考试被修改时重新获取清单
+        :param client: 网络线程的客户端
+        :param address: 服务器地址
+        :return: get_exam_info的响应体，服务器不支持分块下载时返回None
+        """
+        semaphore = asyncio.Semaphore(CHUNK_PARALLEL)
+
+        async def fetch(index: int, digest: str) -> None:
+            async with semaphore:
+                await self.fetch_chunk(client, address, index, digest)
+
+        for _ in range(MANIFEST_RETRIES):
+            response = await client.get(f"{address}/api/v1/get_exam_manifest")
+            if response.status_code != 200 or response.json().get("recode") != 200:
+                return None
+            manifest = PaperManifest.parse_obj(response.json()["data"])
+            results = await asyncio.gather(*[fetch(index, digest) for index, digest in enumerate(manifest.chunks)],
+                                           return_exceptions=True)
+            if errors := [result for result in results if isinstance(result, BaseException)
+                          and not isinstance(result, ManifestChanged)]:
+                raise errors[0]
+            if not any(isinstance(result, ManifestChanged) for result in results):
+                break
+        else:
+            raise ValueError("考试信息在下载期间多次更新，请稍后重试")
+        parts = []
+        for digest in manifest.chunks:
+            with open(self.path(digest), "rb") as file:
+                parts.append(file.read())
+        body = b"".join(parts)
+        if len(body) != manifest.size or sha256(body).hexdigest() != manifest.digest:
+            for digest in manifest.chunks:  # 本地的块已损坏，删除后下次重新下载
+                os.remove(self.path(digest))
+            raise ValueError("试卷完整性校验失败")
+        self.clean(manifest)
+        return body
+
+    def clean(self, manifest: PaperManifest) -> None:
+        """
+        删除不属于当前清单的块
+        :param manifest: 当前清单
+        :return: 无
+        """
+        keep = set(manifest.chunks)
+        for name in os.listdir(self.directory):
+            if name not in keep:
+                os.remove(os.path.join(self.directory, name))